@@ -0,0 +1,76 @@
+"""Sparse fieldsets serialized straight from ``values()`` rows.
+
+Each public field maps to the column (or annotation) it is read from, so
+a request for ``fields=id,text`` selects just those columns plus the ones
+the cursor needs, and a page is serialized in one pass without building
+model instances.
+"""
+from django.core.files.storage import default_storage
+
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comments_count': 'comments_count',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'created': 'created',
+    'author': 'author__username',
+}
+
+
+def _media_url(name):
+    return default_storage.url(name) if name else None
+
+
+CONVERTERS = {
+    'image': _media_url,
+}
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+def parse_fields(value, available, extra=()):
+    """Requested field names in order, all of ``available`` by default"""
+    if not value:
+        return list(available) + list(extra)
+    fields = list(dict.fromkeys(
+        name.strip() for name in value.split(',') if name.strip()
+    ))
+    unknown = set(fields) - set(available) - set(extra)
+    if unknown or not fields:
+        raise InvalidFields(
+            'Unknown fields: %s. Available: %s' % (
+                ', '.join(sorted(unknown)) or '-',
+                ', '.join(list(available) + list(extra)),
+            )
+        )
+    return fields
+
+
+def columns(fields, available, ordering=()):
+    """Columns to pass to ``values()`` for the fields and the cursor"""
+    names = [available[name] for name in fields if name in available]
+    names += [field.lstrip('-') for field in ordering]
+    return list(dict.fromkeys(names))
+
+
+def serialize(rows, fields, available):
+    plan = [
+        (name, available[name], CONVERTERS.get(name))
+        for name in fields if name in available
+    ]
+    return [
+        {
+            name: convert(row[column]) if convert else row[column]
+            for name, column, convert in plan
+        }
+        for row in rows
+    ]
@@ -0,0 +1,131 @@
+from http import HTTPStatus
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+from yatube.query_budget import get_budget
+
+from .. import urls
+
+
+class ApiViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            description='Описание тестовой группы',
+            slug='test-slug'
+        )
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(settings.PAGINATE_BY + 3):
+            cls.post = Post.objects.create(
+                text=f'Пост {i}', author=cls.author, group=cls.group
+            )
+        for i in range(settings.PAGINATE_BY + 1):
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text=f'Ком {i}'
+            )
+        cls.guest_client = Client()
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feeds_return_posts(self):
+        """Ленты отдают записи в JSON с курсором на следующую страницу"""
+        urls = [
+            reverse('api:posts'),
+            reverse('api:group_posts', args=[self.group.slug]),
+            reverse('api:user_posts', args=[self.author.username]),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                data = self.guest_client.get(url).json()
+                self.assertEqual(len(data['results']), settings.PAGINATE_BY)
+                self.assertEqual(data['results'][0]['id'], self.post.id)
+                self.assertEqual(data['results'][0]['author'], 'author')
+                self.assertEqual(data['results'][0]['group'], 'test-slug')
+                self.assertIsNone(data['previous'])
+
+                rest = self.guest_client.get(data['next']).json()
+                self.assertEqual(len(rest['results']), 3)
+                self.assertIsNone(rest['next'])
+
+    def test_follow_feed(self):
+        """Лента подписок доступна только авторизованному пользователю"""
+        response = self.guest_client.get(reverse('api:follow_posts'))
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+
+        data = self.reader_client.get(reverse('api:follow_posts')).json()
+        self.assertEqual(data['results'][0]['id'], self.post.id)
+
+    def test_fields_trim_payload(self):
+        """Параметр fields оставляет в ответе только нужные поля"""
+        data = self.guest_client.get(
+            reverse('api:posts'), {'fields': 'id,text'}
+        ).json()
+        self.assertEqual(set(data['results'][0]), {'id', 'text'})
+
+        response = self.guest_client.get(
+            reverse('api:posts'), {'fields': 'id,password'}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_post_with_comments(self):
+        """Запись отдаётся с первой страницей комментариев"""
+        data = self.guest_client.get(
+            reverse('api:post', args=[self.post.id])
+        ).json()
+        self.assertEqual(data['text'], self.post.text)
+        self.assertEqual(data['comments_count'], settings.PAGINATE_BY + 1)
+        self.assertEqual(data['comments']['results'][0]['text'], 'Ком 0')
+
+        rest = self.guest_client.get(data['comments']['next']).json()
+        self.assertEqual(
+            [comment['text'] for comment in rest['results']],
+            [f'Ком {settings.PAGINATE_BY}']
+        )
+
+        response = self.guest_client.get(reverse('api:post', args=[0]))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_conditional_get(self):
+        """Неизменившаяся лента отвечает 304"""
+        url = reverse('api:posts')
+        etag = self.guest_client.get(url)['ETag']
+
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+        Post.objects.create(text='Новая запись', author=self.author)
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_views_stay_within_budget(self):
+        """Ответы API не превышают бюджет запросов"""
+        values = {
+            'slug': self.group.slug,
+            'username': self.author.username,
+            'post_id': self.post.id,
+        }
+        for pattern in urls.urlpatterns:
+            kwargs = {
+                name: values[name] for name in pattern.pattern.converters
+            }
+            url = reverse('api:' + pattern.name, kwargs=kwargs)
+            with self.subTest(name=pattern.name):
+                with CaptureQueriesContext(connection) as queries:
+                    self.reader_client.get(url)
+                self.assertLessEqual(
+                    len(queries), get_budget(pattern.callback),
+                    '\n'.join(query['sql'] for query in queries)
+                )
@@ -0,0 +1,165 @@
+"""Read-only JSON API for the feeds and single posts.
+
+Feeds use the same cursors, ordering and ETags as the HTML pages. Rows
+are read with ``values()`` restricted to the fields asked for with
+``?fields=`` and serialized without building model instances.
+"""
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.urls import reverse
+from django.views.decorators.http import condition, require_GET
+
+from posts import timeline
+from posts.conditional import author_etag, feed_etag, feed_last_modified
+from posts.models import Comment, Group, Post, User
+from posts.paginator import CursorPaginator
+from yatube.query_budget import query_budget
+
+from .serializers import (
+    COMMENT_FIELDS, POST_FIELDS, InvalidFields, columns, parse_fields,
+    serialize
+)
+
+POST_ORDERING = ('-pub_date', '-id')
+COMMENT_ORDERING = ('created', 'id')
+
+
+def error(status, detail):
+    return JsonResponse({'detail': detail}, status=status)
+
+
+def api_view(view):
+    """GET only, with bad ``fields`` answered by 400"""
+    @require_GET
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except InvalidFields as exception:
+            return error(400, str(exception))
+    return wrapper
+
+
+def page_url(request, cursor, path=None):
+    """Absolute link to the page at ``cursor`` of this or another path"""
+    if cursor is None:
+        return None
+    if path is not None:
+        return request.build_absolute_uri(
+            '%s?%s' % (path, urlencode({'cursor': cursor}))
+        )
+    query = request.GET.copy()
+    query['cursor'] = cursor
+    return request.build_absolute_uri('?' + query.urlencode())
+
+
+def paginated(request, queryset, available, ordering):
+    """A page of serialized rows with links to the neighbouring pages"""
+    fields = parse_fields(request.GET.get('fields'), available)
+    rows = queryset.values(*columns(fields, available, ordering))
+    paginator = CursorPaginator(rows, settings.PAGINATE_BY, ordering)
+    page = paginator.get_page(request.GET.get('cursor'))
+    return {
+        'results': serialize(page, fields, available),
+        'next': page_url(request, page.next_cursor),
+        'previous': page_url(request, page.previous_cursor),
+    }
+
+
+def feed_response(request, queryset, ordering=POST_ORDERING):
+    return JsonResponse(paginated(request, queryset, POST_FIELDS, ordering))
+
+
+@query_budget(3)
+@api_view
+@condition(etag_func=feed_etag, last_modified_func=feed_last_modified)
+def posts(request):
+    """Latest posts"""
+    return feed_response(request, Post.objects.all())
+
+
+@query_budget(4)
+@api_view
+@condition(etag_func=feed_etag, last_modified_func=feed_last_modified)
+def group_posts(request, slug):
+    """Posts of a group"""
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'id', flat=True
+    ).first()
+    if group_id is None:
+        return error(404, 'Group not found')
+    return feed_response(request, Post.objects.filter(group_id=group_id))
+
+
+@query_budget(5)
+@api_view
+@condition(etag_func=author_etag)
+def user_posts(request, username):
+    """Posts of an author"""
+    author_id = User.objects.filter(username=username).values_list(
+        'id', flat=True
+    ).first()
+    if author_id is None:
+        return error(404, 'User not found')
+    return feed_response(request, Post.objects.filter(author_id=author_id))
+
+
+@query_budget(4)
+@api_view
+@condition(etag_func=feed_etag)
+def follow_posts(request):
+    """Posts of the authors the user follows"""
+    if not request.user.is_authenticated:
+        return error(401, 'Authentication required')
+    return feed_response(
+        request, timeline.feed(request.user), timeline.FEED_ORDERING
+    )
+
+
+@query_budget(4)
+@api_view
+@condition(etag_func=feed_etag, last_modified_func=feed_last_modified)
+def post_detail(request, post_id):
+    """A post with the first page of its comments"""
+    fields = parse_fields(
+        request.GET.get('fields'), POST_FIELDS, extra=('comments',)
+    )
+    rows = Post.objects.filter(id=post_id).values(
+        *columns(fields, POST_FIELDS)
+    )
+    data = serialize(rows, fields, POST_FIELDS)
+    if not data:
+        return error(404, 'Post not found')
+    post = data[0]
+    if 'comments' in fields:
+        comments = Comment.objects.filter(post_id=post_id).values(
+            *columns(COMMENT_FIELDS, COMMENT_FIELDS, COMMENT_ORDERING)
+        )
+        paginator = CursorPaginator(
+            comments, settings.PAGINATE_BY, COMMENT_ORDERING
+        )
+        page = paginator.page()
+        post['comments'] = {
+            'results': serialize(page, COMMENT_FIELDS, COMMENT_FIELDS),
+            'next': page_url(
+                request, page.next_cursor,
+                reverse('api:post_comments', args=[post_id])
+            ),
+        }
+    return JsonResponse(post)
+
+
+@query_budget(4)
+@api_view
+@condition(etag_func=feed_etag, last_modified_func=feed_last_modified)
+def post_comments(request, post_id):
+    """Comments of a post, oldest first"""
+    if not Post.objects.filter(id=post_id).exists():
+        return error(404, 'Post not found')
+    return JsonResponse(paginated(
+        request, Comment.objects.filter(post_id=post_id),
+        COMMENT_FIELDS, COMMENT_ORDERING
+    ))
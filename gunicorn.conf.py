@@ -0,0 +1,65 @@
+"""Gunicorn settings, see script.sh.
+
+GUNICORN_WORKER_CLASS is ``gthread`` (default) or ``gevent``. Each
+worker process owns one database connection pool, so the number of
+PostgreSQL connections is at most GUNICORN_WORKERS * DB_POOL_SIZE.
+With gthread keep DB_POOL_SIZE >= GUNICORN_THREADS; with gevent the pool
+size caps concurrent queries while GUNICORN_WORKER_CONNECTIONS caps
+concurrent requests.
+
+With METRICS_DIR set every worker writes its metrics there; the files
+are removed on start and folded into one archive when a worker exits.
+"""
+import glob
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.getenv(
+    'GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1
+))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 100))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+
+
+def _gevent_wait_callback(connection):
+    """Let psycopg2 yield to other greenlets while waiting for the server"""
+    import psycopg2
+    from psycopg2 import extensions
+    from gevent.socket import wait_read, wait_write
+
+    while True:
+        state = connection.poll()
+        if state == extensions.POLL_OK:
+            break
+        elif state == extensions.POLL_READ:
+            wait_read(connection.fileno())
+        elif state == extensions.POLL_WRITE:
+            wait_write(connection.fileno())
+        else:
+            raise psycopg2.OperationalError('Bad poll result: %r' % state)
+
+
+def post_fork(server, worker):
+    if worker_class == 'gevent':
+        from psycopg2 import extensions
+        extensions.set_wait_callback(_gevent_wait_callback)
+
+
+def on_starting(server):
+    directory = os.getenv('METRICS_DIR')
+    if directory:
+        for path in glob.glob(os.path.join(directory, '*.json')):
+            os.remove(path)
+
+
+def child_exit(server, worker):
+    directory = os.getenv('METRICS_DIR')
+    if directory:
+        from yatube.metrics import archive
+        archive(directory, worker.pid)
@@ -1,17 +1,27 @@
 from django.contrib import admin
 
-from .models import Post, Group, Comment, Follow
+from .models import Post, Group, Comment, Follow, Profile
+from .search import search_posts
 
 
 class PostAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'text', 'pub_date', 'author', 'group', 'image')
+    list_display = (
+        'pk', 'text', 'pub_date', 'author', 'group', 'image', 'comments_count'
+    )
     search_fields = ('text',)
     list_filter = ('pub_date', 'author')
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return search_posts(search_term, queryset), False
+
 
 class GroupAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'title', 'description', 'slug')
+    list_display = (
+        'pk', 'title', 'description', 'slug', 'posts_count', 'last_post_date'
+    )
     search_fields = ('title',)
 
 
@@ -26,7 +36,16 @@ class FollowAdmin(admin.ModelAdmin):
     list_filter = ('user', 'author')
 
 
+class ProfileAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk', 'user', 'posts_count', 'followers_count', 'followings_count'
+    )
+    readonly_fields = ('posts_count', 'followers_count', 'followings_count')
+    search_fields = ('user__username',)
+
+
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
 admin.site.register(Comment, CommentAdmin)
 admin.site.register(Follow, FollowAdmin)
+admin.site.register(Profile, ProfileAdmin)
@@ -0,0 +1,65 @@
+"""Version stamps for cached fragments and HTTP validators.
+
+Fragments are cached under keys that include the current stamp, so a
+write only has to replace the stamp to make every old fragment
+unreachable. Stamps are timestamps and double as modification times.
+Nothing is stored under a stamp the read replicas may not have caught
+up with yet, see ``cache_timeout``.
+"""
+import time
+
+from django.core.cache import cache
+
+from yatube import replicas
+
+VERSION_KEY = 'version:%s'
+
+
+def get_version(name):
+    """Current stamp of ``name``, created on first use"""
+    key = VERSION_KEY % name
+    version = cache.get(key)
+    if version is None:
+        version = time.time()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def cache_timeout(timeout, *versions):
+    """``timeout`` of entries keyed by ``versions``, 0 while replicas lag"""
+    if any(replicas.may_lag(version) for version in versions):
+        return 0
+    return timeout
+
+
+def bump_version(name):
+    """Replace the stamp, invalidating everything keyed by it"""
+    cache.set(VERSION_KEY % name, time.time(), None)
+
+
+def feed_version():
+    """Stamp of posts, comments and groups shown in the feeds"""
+    return get_version('feeds')
+
+
+def bump_feed_version():
+    bump_version('feeds')
+
+
+def follows_version(user_id):
+    """Stamp of the follows made by and to the user"""
+    return get_version('follows:%s' % user_id)
+
+
+def bump_follows_version(user_id):
+    bump_version('follows:%s' % user_id)
+
+
+def trending_version():
+    """Stamp of the popular feed ranking"""
+    return get_version('trending')
+
+
+def bump_trending_version():
+    bump_version('trending')
@@ -0,0 +1,49 @@
+"""Rendered post cards cached per post version.
+
+A card looks the same to every visitor except for the edit link, so its
+HTML is cached under the post id and ``Post.version`` and the link is
+put in for the author after the card is read. ``version`` is bumped by
+edits, comments, new renditions and group changes (see ``signals``), so
+a changed post simply gets a new key. A page of cards is fetched with a
+single ``get_many``.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+CARD_KEY = 'post_card:%s:%s'
+EDIT_LINK_SLOT = '<!-- edit-link -->'
+
+
+def touch(queryset):
+    """Bump the version of the posts so their cards are rendered again"""
+    queryset.update(version=F('version') + 1)
+
+
+def card_key(post):
+    return CARD_KEY % (post.pk, post.version)
+
+
+def render_cards(posts, user=None):
+    """HTML of the cards of ``posts`` as seen by ``user``"""
+    keys = [card_key(post) for post in posts]
+    cards = cache.get_many(keys)
+    missing = {
+        key: render_to_string('includes/post_card.html', {'post': post})
+        for key, post in zip(keys, posts) if key not in cards
+    }
+    if missing:
+        cache.set_many(missing, settings.POST_CARD_CACHE_TIMEOUT)
+        cards.update(missing)
+    viewer = user.pk if user is not None and user.is_authenticated else None
+    result = []
+    for key, post in zip(keys, posts):
+        card = cards[key]
+        if viewer is not None and post.author_id == viewer:
+            card = card.replace(EDIT_LINK_SLOT, render_to_string(
+                'includes/post_edit_link.html', {'post': post}
+            ))
+        result.append(mark_safe(card))
+    return result
@@ -0,0 +1,64 @@
+"""Validators for conditional GET on the feed, profile and post pages.
+
+ETags are built from version stamps and stored counters instead of the
+rendered page, so a matching ``If-None-Match`` is answered with
+``304 Not Modified`` before the view runs. Everything the page depends
+on for the viewing user (the navigation bar, author-only edit links, the
+``following`` flag) is part of the ETag. The feeds also send
+Last-Modified to anonymous users, whose pages do not depend on who is
+viewing them. No validators are sent while the read replicas may not
+have caught up with a stamp: the page would be stale under a new ETag.
+"""
+import hashlib
+from datetime import datetime, timezone
+
+from django.utils.timezone import localdate
+
+from yatube import replicas
+
+from .cache import feed_version, follows_version, trending_version
+from .models import Profile
+
+
+def _etag(request, stamps, *parts):
+    viewer = request.user.pk if request.user.is_authenticated else None
+    if viewer is not None:
+        stamps += (follows_version(viewer),)
+    if any(replicas.may_lag(stamp) for stamp in stamps):
+        return None
+    parts = (request.get_full_path(), viewer) + stamps + parts
+    raw = '|'.join(str(part) for part in parts)
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def _author_counters(username):
+    return Profile.objects.filter(user__username=username).values_list(
+        'posts_count', 'followers_count', 'followings_count'
+    ).first()
+
+
+def feed_etag(request, *args, **kwargs):
+    return _etag(request, (feed_version(),))
+
+
+def author_etag(request, username, *args, **kwargs):
+    return _etag(request, (feed_version(),), _author_counters(username))
+
+
+def trending_etag(request, *args, **kwargs):
+    return _etag(request, (feed_version(), trending_version()))
+
+
+def groups_etag(request, *args, **kwargs):
+    # Posts of the last days are counted by date, so the list changes
+    # at midnight without any write.
+    return _etag(request, (feed_version(),), localdate())
+
+
+def feed_last_modified(request, *args, **kwargs):
+    if request.user.is_authenticated:
+        return None
+    version = feed_version()
+    if replicas.may_lag(version):
+        return None
+    return datetime.fromtimestamp(version, tz=timezone.utc)
@@ -0,0 +1,75 @@
+"""Denormalized counters kept by the write paths.
+
+``Post.comments_count``, ``Group.posts_count`` and the ``Profile``
+counters are changed with single ``UPDATE ... SET x = x + 1`` statements
+inside the transaction of the write, ``repair`` recomputes them in bulk
+when they drift.
+"""
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from . import directory
+from .models import Comment, Follow, Group, Post, Profile, User
+
+
+def bump(queryset, field, delta, **updates):
+    """Atomically add ``delta`` to ``field`` without going below zero.
+
+    ``updates`` are applied by the same ``UPDATE`` statement.
+    """
+    queryset.update(**{field: Greatest(F(field) + delta, 0)}, **updates)
+
+
+def _count(queryset, key, outer='pk'):
+    return Coalesce(Subquery(
+        queryset.filter(**{key: OuterRef(outer)}).order_by().values(key)
+        .annotate(total=Count('pk')).values('total'),
+        output_field=IntegerField()
+    ), 0)
+
+
+def _repair(queryset, counters, dry_run, **updates):
+    actual = {'actual_%s' % field: value for field, value in counters.items()}
+    drifted = queryset.annotate(**actual).filter(
+        Q(*[~Q(**{field: F('actual_%s' % field)}) for field in counters],
+          _connector=Q.OR)
+    )
+    found = drifted.count()
+    if found and not dry_run:
+        queryset.filter(pk__in=drifted.values('pk')).update(
+            **counters, **updates
+        )
+    return found
+
+
+def repair(dry_run=False):
+    """Recompute every counter, return the number of drifted rows"""
+    with transaction.atomic():
+        missing = User.objects.filter(profile__isnull=True)
+        created = missing.count()
+        if created and not dry_run:
+            Profile.objects.bulk_create(
+                [Profile(user_id=pk)
+                 for pk in missing.values_list('pk', flat=True)],
+                batch_size=500
+            )
+        posts = _repair(Post.objects.all(), {
+            'comments_count': _count(Comment.objects.all(), 'post'),
+        }, dry_run, version=F('version') + 1)
+        profiles = _repair(Profile.objects.all(), {
+            'posts_count': _count(Post.objects.all(), 'author', 'user'),
+            'followers_count': _count(
+                Follow.objects.all(), 'author', 'user'
+            ),
+            'followings_count': _count(Follow.objects.all(), 'user', 'user'),
+        }, dry_run)
+        groups = _repair(Group.objects.all(), {
+            'posts_count': _count(Post.objects.all(), 'group'),
+        }, dry_run, last_post_date=directory.latest_post_date())
+        if not dry_run:
+            directory.rebuild_activity()
+    return {
+        'profiles created': created, 'posts': posts, 'profiles': profiles,
+        'groups': groups,
+    }
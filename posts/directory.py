@@ -0,0 +1,107 @@
+"""Stats of the group directory, kept by the write paths.
+
+Every group stores its number of posts and the date of its latest post,
+``GroupActivity`` stores the number of posts per group and day. The
+signals of ``Post`` change them with single ``UPDATE`` statements when a
+post is published, deleted or moved to another group (the group a post
+had when it was loaded is remembered by ``Post.from_db``). The directory
+then reads every group with its stats and the posts of the last
+``RECENT_DAYS`` in one query.
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import (
+    Case, Count, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+)
+from django.db.models.functions import Coalesce, Greatest, TruncDate
+from django.utils import timezone
+
+from .models import Group, GroupActivity, Post
+
+RECENT_DAYS = 7
+ORDERING = ('title', 'id')
+
+
+def _day(date):
+    return timezone.localdate(date)
+
+
+def latest_post_date():
+    """Date of the latest post of the outer group"""
+    return Subquery(
+        Post.objects.filter(group=OuterRef('pk')).order_by(
+            '-pub_date', '-id'
+        ).values('pub_date')[:1]
+    )
+
+
+def _add_activity(group_id, day, delta):
+    updated = GroupActivity.objects.filter(group_id=group_id, day=day).update(
+        posts_count=Greatest(F('posts_count') + delta, 0)
+    )
+    if updated or delta < 0:
+        return
+    try:
+        with transaction.atomic():
+            GroupActivity.objects.create(
+                group_id=group_id, day=day, posts_count=delta
+            )
+    except IntegrityError:
+        # Created by a concurrent write in the meantime.
+        _add_activity(group_id, day, delta)
+
+
+def post_added(group_id, pub_date):
+    Group.objects.filter(pk=group_id).update(
+        posts_count=F('posts_count') + 1,
+        last_post_date=Case(
+            When(last_post_date__gt=pub_date, then=F('last_post_date')),
+            default=Value(pub_date)
+        )
+    )
+    _add_activity(group_id, _day(pub_date), 1)
+
+
+def post_removed(group_id, pub_date):
+    """Count a post out of a group, after it has left the table or group"""
+    Group.objects.filter(pk=group_id).update(
+        posts_count=Greatest(F('posts_count') - 1, 0),
+        last_post_date=latest_post_date()
+    )
+    _add_activity(group_id, _day(pub_date), -1)
+
+
+def recent_posts_count(days=RECENT_DAYS):
+    """Posts of the outer group published in the last ``days`` days"""
+    since = timezone.localdate() - timedelta(days=days - 1)
+    return Coalesce(Subquery(
+        GroupActivity.objects.filter(
+            group=OuterRef('pk'), day__gte=since
+        ).order_by().values('group').annotate(
+            total=Sum('posts_count')
+        ).values('total'),
+        output_field=IntegerField()
+    ), 0)
+
+
+def groups():
+    """Groups with their stats, ``recent_posts_count`` included"""
+    return Group.objects.annotate(recent_posts_count=recent_posts_count())
+
+
+def rebuild_activity():
+    """Recount the daily activity of every group from the posts"""
+    days = Post.objects.filter(group__isnull=False).annotate(
+        day=TruncDate('pub_date')
+    ).order_by().values('group_id', 'day').annotate(total=Count('pk'))
+    with transaction.atomic():
+        GroupActivity.objects.all().delete()
+        GroupActivity.objects.bulk_create([
+            GroupActivity(
+                group_id=row['group_id'], day=row['day'],
+                posts_count=row['total']
+            )
+            for row in days
+        ], batch_size=500)
+    return GroupActivity.objects.count()
@@ -0,0 +1,68 @@
+"""Cached sets of the authors each user follows.
+
+The ids are kept as a sorted ``array`` in the shared cache, loaded with
+one query on first use, so "does the user follow this author" is
+answered without a query on every page. The key includes the user's
+follows version, which the ``Follow`` signals replace once the change
+has committed, and the next read loads the set again: an update in
+place could lose a concurrent change or keep a rolled back one. A load
+that read the rows before the commit stores them under the version it
+started with, which nobody reads any more. The sets are read from the
+shared cache directly: a copy in a worker's local tier could still say
+"not following" for a few seconds after the user has followed.
+"""
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from .cache import bump_follows_version, follows_version
+from .models import Follow
+
+KEY = 'following:%s:%s'
+
+
+def _cache():
+    return caches[settings.FOLLOWING_CACHE]
+
+
+def _key(user_id):
+    return KEY % (user_id, follows_version(user_id))
+
+
+def _load(user_id, key):
+    # Cached for a day, so not read from a replica that may lag behind.
+    ids = array('q', Follow.objects.using(DEFAULT_DB_ALIAS).filter(
+        user_id=user_id
+    ).order_by('author_id').values_list('author_id', flat=True))
+    _cache().set(key, ids, settings.FOLLOWING_CACHE_TIMEOUT)
+    return ids
+
+
+def followed_ids(user_id):
+    """Sorted ids of the authors followed by the user"""
+    # The version is read before the rows, see the module docstring.
+    key = _key(user_id)
+    ids = _cache().get(key)
+    if ids is None:
+        ids = _load(user_id, key)
+    return ids
+
+
+def _contains(ids, author_id):
+    index = bisect_left(ids, author_id)
+    return index < len(ids) and ids[index] == author_id
+
+
+def is_following(user, author_id):
+    """Whether ``user`` (possibly anonymous) follows the author"""
+    if not user.is_authenticated:
+        return False
+    return _contains(followed_ids(user.pk), author_id)
+
+
+def changed(user_id):
+    """Move the user to a new cached set when the transaction commits"""
+    transaction.on_commit(lambda: bump_follows_version(user_id))
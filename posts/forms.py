@@ -1,5 +1,8 @@
 from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
 
+from . import images
 from .models import Comment, Post, Group
 
 
@@ -8,6 +11,27 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ['text', 'group', 'image']
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if not isinstance(image, UploadedFile):
+            return image
+        try:
+            return images.process(image)
+        except images.ImageRejected as error:
+            if error.code == 'size':
+                raise forms.ValidationError(
+                    'Файл больше %(limit)s МБ',
+                    params={'limit': (
+                        settings.POST_IMAGE_MAX_UPLOAD_SIZE // 1024 // 1024
+                    )},
+                    code='image_too_large'
+                )
+            raise forms.ValidationError(
+                'Картинка больше %(limit)s пикселей по длинной стороне',
+                params={'limit': settings.POST_IMAGE_MAX_DIMENSION},
+                code='image_too_large'
+            )
+
 
 class GroupForm(forms.ModelForm):
     class Meta:
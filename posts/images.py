@@ -0,0 +1,75 @@
+"""Processing of uploaded post images.
+
+Uploads are checked against ``POST_IMAGE_MAX_UPLOAD_SIZE`` and
+``POST_IMAGE_MAX_DIMENSION`` before they are decoded in full, rotated
+according to their EXIF orientation, scaled down to fit
+``POST_IMAGE_MAX_SIZE`` and re-encoded as ``POST_IMAGE_FORMAT`` without
+metadata. The stored file is already small; the sizes shown on pages are
+rendered from it by ``renditions``.
+"""
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, features
+
+EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg'}
+
+
+class ImageRejected(ValueError):
+    """``code`` is ``size`` or ``dimensions``"""
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+
+def output_format():
+    """Configured format, progressive JPEG if Pillow cannot write WebP"""
+    image_format = settings.POST_IMAGE_FORMAT
+    if image_format == 'WEBP' and not features.check('webp'):
+        return 'JPEG'
+    return image_format
+
+
+def check_limits(upload):
+    """Raise ``ImageRejected`` if the upload is too big to be processed"""
+    if upload.size > settings.POST_IMAGE_MAX_UPLOAD_SIZE:
+        raise ImageRejected('size')
+    upload.seek(0)
+    with Image.open(upload) as image:
+        # Only the header has been read at this point.
+        if max(image.size) > settings.POST_IMAGE_MAX_DIMENSION:
+            raise ImageRejected('dimensions')
+    upload.seek(0)
+
+
+def reencode(upload):
+    """Return a stripped, resized and re-encoded copy of the image"""
+    upload.seek(0)
+    with Image.open(upload) as source:
+        image = ImageOps.exif_transpose(source)
+        has_alpha = image.mode in ('RGBA', 'LA') or (
+            image.mode == 'P' and 'transparency' in image.info
+        )
+        image_format = output_format()
+        image = image.convert(
+            'RGBA' if has_alpha and image_format == 'WEBP' else 'RGB'
+        )
+        limit = settings.POST_IMAGE_MAX_SIZE
+        image.thumbnail((limit, limit), Image.LANCZOS)
+        buffer = BytesIO()
+        options = {'quality': settings.POST_IMAGE_QUALITY, 'optimize': True}
+        if image_format == 'JPEG':
+            options['progressive'] = True
+        image.save(buffer, image_format, **options)
+    stem = os.path.splitext(os.path.basename(upload.name))[0] or 'image'
+    return ContentFile(
+        buffer.getvalue(), name='%s.%s' % (stem, EXTENSIONS[image_format])
+    )
+
+
+def process(upload):
+    check_limits(upload)
+    return reencode(upload)
@@ -0,0 +1,86 @@
+"""Measure what opening a database connection costs a request.
+
+Every iteration runs ``SELECT 1`` the way a request would: with a fresh
+connection that is closed afterwards (``CONN_MAX_AGE = 0`` with a plain
+backend), with a persistent connection, and, when the pooled engine is
+configured, with a connection checked out of and returned to the pool.
+"""
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.utils import load_backend
+
+POOLED_ENGINE = 'yatube.pooled_postgresql'
+PLAIN_ENGINES = {POOLED_ENGINE: 'django.db.backends.postgresql'}
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, len(ordered) * percent // 100)]
+
+
+def run_query(wrapper):
+    with wrapper.cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+
+
+class Command(BaseCommand):
+    help = 'Compare per-request cost of new, persistent and pooled connections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--iterations', type=int, default=200)
+
+    def handle(self, *args, **options):
+        settings_dict = connections[options['database']].settings_dict
+        engine = settings_dict['ENGINE']
+        plain = load_backend(PLAIN_ENGINES.get(engine, engine))
+        self.alias = options['database']
+        self.iterations = options['iterations']
+
+        results = [
+            ('new connection', self.measure(plain, settings_dict, True)),
+            ('persistent', self.measure(plain, settings_dict, False)),
+        ]
+        if engine == POOLED_ENGINE:
+            results.append((
+                'pooled',
+                self.measure(load_backend(engine), settings_dict, True),
+            ))
+
+        self.stdout.write(
+            f'{engine}, {self.iterations} iterations, milliseconds'
+        )
+        self.stdout.write(f'{"mode":<16}{"mean":>8}{"p50":>8}{"p95":>8}')
+        for name, timings in results:
+            self.stdout.write(
+                f'{name:<16}{statistics.mean(timings):>8.3f}'
+                f'{percentile(timings, 50):>8.3f}'
+                f'{percentile(timings, 95):>8.3f}'
+            )
+        saved = (
+            statistics.mean(results[0][1]) - statistics.mean(results[-1][1])
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Setup cost removed per request: {saved:.3f} ms'
+        ))
+
+    def measure(self, backend, settings_dict, close_after_request):
+        wrapper = backend.DatabaseWrapper(dict(settings_dict), self.alias)
+        run_query(wrapper)
+        if close_after_request:
+            wrapper.close()
+        timings = []
+        try:
+            for _ in range(self.iterations):
+                started = time.perf_counter()
+                run_query(wrapper)
+                if close_after_request:
+                    wrapper.close()
+                timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            wrapper.close()
+        return timings
@@ -0,0 +1,293 @@
+"""Replay a weighted mix of requests against every route of posts.urls.
+
+By default requests go through the test ``Client`` in this process, so
+the numbers cover middleware, views, templates, the cache and the
+database but not the network, nginx or gunicorn; SQL queries per request
+are counted too. With ``--url`` the requests are sent over HTTP to a
+running server, one connection each, and time the whole served stack.
+The server has to use the same database and session store: logged in
+requests carry sessions created here. Run it against a seeded database
+(``manage.py seed``) and compare the JSON reports of two releases::
+
+    python manage.py benchmark_routes --requests 5000 --json before.json
+    python manage.py benchmark_routes --url http://localhost --json http.json
+
+The mix mutates data (comments, follows) unless ``--read-only`` is given.
+"""
+import json
+import random
+import statistics
+import time
+from collections import defaultdict, namedtuple
+from contextlib import ExitStack
+from http.cookies import SimpleCookie
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import HTTPRedirectHandler, Request, build_opener
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+
+from posts import urls
+from posts.models import Follow, Group, Post, User
+from yatube.query_budget import QueryCounter
+
+from .benchmark_connections import percentile
+
+# url name: (weight, method, needs a logged in user)
+MIX = {
+    'index': (30, 'get', False),
+    'popular': (5, 'get', False),
+    'groups': (3, 'get', False),
+    'group': (10, 'get', False),
+    'profile': (15, 'get', False),
+    'post': (20, 'get', False),
+    'post_comments': (3, 'get', False),
+    'search': (5, 'get', False),
+    'follow_index': (10, 'get', True),
+    'new_post': (2, 'get', True),
+    'post_edit': (2, 'get', True),
+    'group_create': (1, 'get', True),
+    'add_comment': (3, 'post', True),
+    'profile_follow': (1, 'get', True),
+    'profile_unfollow': (1, 'get', True),
+}
+WRITES = {'add_comment', 'profile_follow', 'profile_unfollow'}
+SAMPLE_SIZE = 200
+
+Response = namedtuple('Response', 'status_code')
+
+
+class NoRedirect(HTTPRedirectHandler):
+    """Report redirects like the test ``Client`` instead of following"""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpClient:
+    """The part of the test ``Client`` used here, over real HTTP"""
+
+    opener = build_opener(NoRedirect)
+
+    def __init__(self, url, cookies):
+        self.url = url.rstrip('/')
+        self.cookies = dict(cookies)
+
+    def get(self, path):
+        return self.send('GET', path)
+
+    def post(self, path, data):
+        return self.send('POST', path, urlencode(data).encode(), {
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'X-CSRFToken': self.cookies.get(settings.CSRF_COOKIE_NAME, ''),
+        })
+
+    def send(self, method, path, body=None, headers=()):
+        headers = dict(headers, Referer=self.url + path)
+        if self.cookies:
+            headers['Cookie'] = '; '.join(
+                f'{name}={value}' for name, value in self.cookies.items()
+            )
+        request = Request(self.url + path, body, headers, method=method)
+        try:
+            with self.opener.open(request) as response:
+                response.read()
+                status, received = response.status, response.headers
+        except HTTPError as error:
+            status, received = error.code, error.headers
+        for header in received.get_all('Set-Cookie') or ():
+            for name, morsel in SimpleCookie(header).items():
+                self.cookies[name] = morsel.value
+        return Response(status)
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure latency, queries and throughput of the posts routes, '
+        'in this process or with --url over HTTP against a running server'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--warmup', type=int, default=100)
+        parser.add_argument('--read-only', action='store_true')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--json', help='Also write the report here')
+        parser.add_argument(
+            '--url', help='Base URL of a running server to send requests to'
+        )
+
+    def handle(self, *args, **options):
+        names = [pattern.name for pattern in urls.urlpatterns]
+        missing = set(names) - set(MIX)
+        if missing:
+            raise CommandError(
+                'Routes without a weight in MIX: ' + ', '.join(sorted(missing))
+            )
+        self.random = random.Random(options['seed'])
+        self.load_samples()
+        mix = [
+            name for name in names
+            if not (options['read_only'] and name in WRITES)
+        ]
+        weights = [MIX[name][0] for name in mix]
+        host = next(
+            (host.lstrip('.') for host in settings.ALLOWED_HOSTS
+             if host and '*' not in host),
+            'testserver'
+        )
+        self.clients = {}
+        self.host = host
+        self.url = options['url']
+        self.anonymous = self.new_client()
+
+        for name in self.random.choices(mix, weights, k=options['warmup']):
+            self.request(name)
+
+        timings, queries = defaultdict(list), defaultdict(list)
+        errors = defaultdict(int)
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            for name in self.random.choices(
+                    mix, weights, k=options['requests']):
+                counter.count = 0
+                request_started = time.perf_counter()
+                status = self.request(name)
+                timings[name].append(
+                    (time.perf_counter() - request_started) * 1000
+                )
+                if not self.url:
+                    queries[name].append(counter.count)
+                if status >= 400:
+                    errors[name] += 1
+        elapsed = time.perf_counter() - started
+
+        report = {
+            'requests': options['requests'],
+            'seconds': elapsed,
+            'rps': options['requests'] / elapsed if elapsed else 0,
+            'routes': {
+                name: self.summary(timings[name], queries[name], errors[name])
+                for name in mix if timings[name]
+            },
+            'total': self.summary(
+                sum(timings.values(), []), sum(queries.values(), []),
+                sum(errors.values())
+            ),
+        }
+        self.print_report(report)
+        if options['json']:
+            with open(options['json'], 'w') as output:
+                json.dump(report, output, indent=2)
+
+    def load_samples(self):
+        posts = list(Post.objects.order_by('?').values_list(
+            'id', 'author_id', 'author__username'
+        )[:SAMPLE_SIZE])
+        if not posts:
+            raise CommandError('No posts, run "manage.py seed" first')
+        self.posts = posts
+        self.usernames = [username for _, _, username in posts]
+        self.user_ids = list(User.objects.order_by('?').values_list(
+            'id', flat=True
+        )[:SAMPLE_SIZE])
+        self.slugs = list(Group.objects.values_list('slug', flat=True)[:50])
+        self.follows = list(Follow.objects.order_by('?').values_list(
+            'user_id', 'author__username'
+        )[:SAMPLE_SIZE])
+        words = ' '.join(Post.objects.filter(
+            id__in=[post_id for post_id, _, _ in posts[:20]]
+        ).values_list('text', flat=True)).split()
+        self.words = [word.strip('.,!?') for word in words if len(word) > 4]
+
+    def new_client(self, user=None):
+        client = Client(HTTP_HOST=self.host)
+        if user is not None:
+            client.force_login(user)
+        if not self.url:
+            return client
+        client = HttpClient(self.url, {
+            name: morsel.value for name, morsel in client.cookies.items()
+        })
+        if user is not None:
+            # Sets the CSRF cookie the form posts need.
+            client.get(reverse('new_post'))
+        return client
+
+    def client(self, user_id):
+        client = self.clients.get(user_id)
+        if client is None:
+            client = self.clients[user_id] = self.new_client(
+                User.objects.get(pk=user_id)
+            )
+        return client
+
+    def target(self, name):
+        """URL with random objects for the route and the requesting user"""
+        post_id, author_id, username = self.random.choice(self.posts)
+        user_id = self.random.choice(self.user_ids)
+        if name in ('post', 'post_comments', 'add_comment'):
+            return reverse(name, args=[username, post_id]), user_id
+        if name == 'post_edit':
+            # Only the author can open the form.
+            return reverse(name, args=[username, post_id]), author_id
+        if name in ('profile', 'profile_follow'):
+            username = self.random.choice(self.usernames)
+        elif name == 'profile_unfollow':
+            if self.follows:
+                user_id, username = self.random.choice(self.follows)
+        elif name == 'group':
+            slug = self.random.choice(self.slugs) if self.slugs else 'none'
+            return reverse(name, args=[slug]), user_id
+        elif name == 'search':
+            return reverse(name) + '?' + urlencode({
+                'q': self.random.choice(self.words) if self.words else 'test'
+            }), user_id
+        else:
+            return reverse(name), user_id
+        return reverse(name, args=[username]), user_id
+
+    def request(self, name):
+        """Send one request for the route, return the status code"""
+        _, method, login = MIX[name]
+        url, user_id = self.target(name)
+        client = self.client(user_id) if login else self.anonymous
+        if method == 'post':
+            return client.post(url, {'text': 'Benchmark comment'}).status_code
+        return client.get(url).status_code
+
+    @staticmethod
+    def summary(timings, queries, errors):
+        return {
+            'count': len(timings),
+            'errors': errors,
+            'p50': percentile(timings, 50),
+            'p95': percentile(timings, 95),
+            'p99': percentile(timings, 99),
+            'queries': statistics.mean(queries) if queries else None,
+        }
+
+    def print_report(self, report):
+        self.stdout.write(
+            f'{"route":<18}{"count":>7}{"err":>5}{"p50 ms":>9}'
+            f'{"p95 ms":>9}{"p99 ms":>9}{"queries":>9}'
+        )
+        rows = list(report['routes'].items()) + [('total', report['total'])]
+        for name, row in rows:
+            queries = row['queries']
+            self.stdout.write(
+                f'{name:<18}{row["count"]:>7}{row["errors"]:>5}'
+                f'{row["p50"]:>9.2f}{row["p95"]:>9.2f}{row["p99"]:>9.2f}'
+                + (f'{queries:>9.1f}' if queries is not None else f'{"-":>9}')
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'{report["requests"]} requests in {report["seconds"]:.1f}s, '
+            f'{report["rps"]:.1f} requests/s'
+        ))
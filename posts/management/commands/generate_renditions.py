@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.renditions import generate
+
+
+class Command(BaseCommand):
+    help = 'Generate image renditions for posts that do not have them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Regenerate renditions of every post with an image',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['all']:
+            posts = posts.filter(renditions='')
+        done = 0
+        for post_id in posts.values_list('pk', flat=True).iterator():
+            generate(post_id)
+            done += 1
+        self.stdout.write(self.style.SUCCESS(f'Renditions generated: {done}'))
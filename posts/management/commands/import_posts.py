@@ -0,0 +1,323 @@
+"""Bulk import of users, groups, posts, comments and follows.
+
+The input is JSON Lines, one object per line::
+
+    {"type": "user", "username": "ozzy", "first_name": "", "email": ""}
+    {"type": "group", "slug": "rock", "title": "Rock", "description": ""}
+    {"type": "post", "author": "ozzy", "group": "rock", "text": "...",
+     "pub_date": "2021-05-01T10:00:00+00:00", "image": "https://...",
+     "comments": [{"author": "tony", "text": "...", "created": "..."}]}
+    {"type": "follow", "user": "tony", "author": "ozzy"}
+
+Authors and groups are resolved through in-memory maps, rows are written
+with ``bulk_create`` and every chunk of lines is one transaction. The
+byte offset of the first unprocessed line is saved to a checkpoint file
+after each chunk, so an interrupted import continues where it stopped.
+Signals are not sent for bulk inserts: timelines are filled per chunk
+with the celebrity check counted from the ``Follow`` rows, counters are
+repaired and the feed caches are invalidated at the end.
+"""
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlparse
+from urllib.request import urlopen
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.text import get_valid_filename
+
+from posts import images, timeline
+from posts.cache import bump_feed_version
+from posts.counters import repair
+from posts.models import Comment, Follow, Group, Post, Profile, User
+
+
+@contextmanager
+def preserve_dates():
+    """Keep imported dates instead of letting auto_now_add overwrite them"""
+    fields = [
+        Post._meta.get_field('pub_date'),
+        Comment._meta.get_field('created'),
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def parse_date(value):
+    date = parse_datetime(value) if value else None
+    if date is None:
+        return timezone.now()
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date, timezone.utc)
+    return date
+
+
+class Command(BaseCommand):
+    help = 'Import posts, comments and follows from a JSON Lines file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='JSON Lines file to import')
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help='Lines committed in one transaction',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Rows per INSERT statement',
+        )
+        parser.add_argument(
+            '--image-workers', type=int, default=8,
+            help='Threads fetching and storing images',
+        )
+        parser.add_argument(
+            '--media-dir', default='',
+            help='Directory relative image paths are read from',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Checkpoint file (default: <path>.checkpoint)',
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Ignore the checkpoint and import from the beginning',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'File {path} does not exist')
+        self.batch_size = options['batch_size']
+        self.media_dir = options['media_dir']
+        self.checkpoint = options['checkpoint'] or path + '.checkpoint'
+        offset, self.stats = 0, {}
+        if not options['restart'] and os.path.exists(self.checkpoint):
+            with open(self.checkpoint) as checkpoint:
+                state = json.load(checkpoint)
+            offset, self.stats = state['offset'], state['stats']
+            self.stdout.write(f'Resuming from byte {offset}')
+
+        self.users = dict(User.objects.values_list('username', 'id'))
+        self.groups = dict(Group.objects.values_list('slug', 'id'))
+        self.started = time.monotonic()
+        self.imported_lines = 0
+        total = os.path.getsize(path)
+
+        with open(path, 'rb') as source, preserve_dates(), ThreadPoolExecutor(
+                max_workers=options['image_workers']) as self.images:
+            source.seek(offset)
+            while True:
+                records = []
+                for line in source:
+                    line = line.strip()
+                    if line:
+                        records.append(json.loads(line))
+                    if len(records) >= options['chunk_size']:
+                        break
+                if not records:
+                    break
+                with transaction.atomic():
+                    self.import_chunk(records)
+                self.imported_lines += len(records)
+                self.save_checkpoint(source.tell())
+                self.report(source.tell(), total)
+
+        self.stdout.write('Repairing counters...')
+        repair()
+        bump_feed_version()
+        if os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
+        self.stdout.write(self.style.SUCCESS(
+            'Import finished: ' + ', '.join(
+                f'{name} {count}' for name, count in self.stats.items()
+            )
+        ))
+        self.stdout.write(
+            'Run "manage.py generate_renditions" to prepare post images'
+        )
+
+    def count(self, name, value=1):
+        self.stats[name] = self.stats.get(name, 0) + value
+
+    def save_checkpoint(self, offset):
+        temporary = self.checkpoint + '.tmp'
+        with open(temporary, 'w') as checkpoint:
+            json.dump({'offset': offset, 'stats': self.stats}, checkpoint)
+        os.replace(temporary, self.checkpoint)
+
+    def report(self, position, total):
+        elapsed = time.monotonic() - self.started
+        rate = self.imported_lines / elapsed if elapsed else 0
+        self.stdout.write(
+            f'{position * 100 // max(total, 1)}% '
+            f'lines {self.imported_lines} in {elapsed:.1f}s '
+            f'({rate:.0f} lines/s), posts {self.stats.get("posts", 0)}, '
+            f'comments {self.stats.get("comments", 0)}'
+        )
+
+    def import_chunk(self, records):
+        by_type = {}
+        for record in records:
+            by_type.setdefault(record.get('type'), []).append(record)
+        unknown = len(records) - sum(
+            len(by_type.get(name, ()))
+            for name in ('user', 'group', 'post', 'follow')
+        )
+        if unknown:
+            self.count('skipped', unknown)
+        self.import_users(by_type.get('user', []))
+        self.import_groups(by_type.get('group', []))
+        self.import_posts(by_type.get('post', []))
+        self.import_follows(by_type.get('follow', []))
+
+    def import_users(self, records):
+        new = {
+            record['username']: record for record in records
+            if record['username'] not in self.users
+        }
+        if not new:
+            return
+        password = make_password(None)
+        User.objects.bulk_create([
+            User(
+                username=username,
+                first_name=record.get('first_name', ''),
+                last_name=record.get('last_name', ''),
+                email=record.get('email', ''),
+                password=password,
+            )
+            for username, record in new.items()
+        ], batch_size=self.batch_size)
+        created = dict(
+            User.objects.filter(
+                username__in=list(new)
+            ).values_list('username', 'id')
+        )
+        Profile.objects.bulk_create(
+            [Profile(user_id=pk) for pk in created.values()],
+            batch_size=self.batch_size,
+            ignore_conflicts=True
+        )
+        self.users.update(created)
+        self.count('users', len(created))
+
+    def import_groups(self, records):
+        new = {
+            record['slug']: record for record in records
+            if record['slug'] not in self.groups
+        }
+        if not new:
+            return
+        Group.objects.bulk_create([
+            Group(
+                slug=slug,
+                title=record.get('title', slug),
+                description=record.get('description', ''),
+            )
+            for slug, record in new.items()
+        ], batch_size=self.batch_size)
+        self.groups.update(
+            Group.objects.filter(slug__in=list(new)).values_list('slug', 'id')
+        )
+        self.count('groups', len(new))
+
+    def fetch_image(self, source):
+        """Process and store an image from a URL or a local path"""
+        try:
+            if urlparse(source).scheme in ('http', 'https'):
+                with urlopen(source, timeout=30) as response:
+                    content = response.read()
+            else:
+                with open(os.path.join(self.media_dir, source), 'rb') as file:
+                    content = file.read()
+        except OSError:
+            return None
+        name = get_valid_filename(os.path.basename(urlparse(source).path))
+        try:
+            image = images.process(ContentFile(content, name=name or 'image'))
+        except (images.ImageRejected, OSError):
+            return None
+        return default_storage.save('posts/' + image.name, image)
+
+    def import_posts(self, records):
+        known = [
+            record for record in records if record.get('author') in self.users
+        ]
+        if len(known) < len(records):
+            self.count('skipped', len(records) - len(known))
+        images = list(self.images.map(
+            lambda record: (
+                self.fetch_image(record['image'])
+                if record.get('image') else None
+            ),
+            known
+        ))
+        comments = [
+            [comment for comment in record.get('comments', ())
+             if comment.get('author') in self.users]
+            for record in known
+        ]
+        posts = [
+            Post(
+                author_id=self.users[record['author']],
+                group_id=self.groups.get(record.get('group')),
+                text=record.get('text', ''),
+                pub_date=parse_date(record.get('pub_date')),
+                image=image,
+                comments_count=len(post_comments),
+            )
+            for record, image, post_comments in zip(known, images, comments)
+        ]
+        if not connection.features.can_return_ids_from_bulk_insert:
+            # Without RETURNING the ids are assigned here; the chunk
+            # transaction holds the write lock on these backends.
+            last = Post.objects.aggregate(last=Max('id'))['last'] or 0
+            for number, post in enumerate(posts, start=last + 1):
+                post.id = number
+        Post.objects.bulk_create(posts, batch_size=self.batch_size)
+        comments = [
+            Comment(
+                post_id=post.id,
+                author_id=self.users[comment['author']],
+                text=comment.get('text', ''),
+                created=parse_date(comment.get('created')),
+            )
+            for post, post_comments in zip(posts, comments)
+            for comment in post_comments
+        ]
+        Comment.objects.bulk_create(comments, batch_size=self.batch_size)
+        timeline.fan_out_many(posts)
+        self.count('posts', len(posts))
+        self.count('comments', len(comments))
+        self.count('images', sum(1 for image in images if image))
+
+    def import_follows(self, records):
+        pairs = {
+            (self.users[record['user']], self.users[record['author']])
+            for record in records
+            if record.get('user') in self.users
+            and record.get('author') in self.users
+            and record['user'] != record['author']
+        }
+        if not pairs:
+            return
+        Follow.objects.bulk_create(
+            [Follow(user_id=user, author_id=author) for user, author in pairs],
+            batch_size=self.batch_size,
+            ignore_conflicts=True
+        )
+        timeline.backfill_many(pairs)
+        self.count('follows', len(pairs))
@@ -0,0 +1,81 @@
+"""Summarize the request profiles written by yatube.profiling.
+
+For every view: how many requests were dumped, their mean and worst
+duration, the functions with the most own time and the SQL statements
+with the most total time. Statements are grouped after literals are
+replaced by ``?``, so the same query with other ids is one row.
+"""
+import glob
+import json
+import os
+import re
+import statistics
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+LISTS = re.compile(r'\((?:\s*\?\s*,)+\s*\?\s*\)')
+
+
+def normalize(sql):
+    return LISTS.sub('(...)', LITERALS.sub('?', ' '.join(sql.split())))
+
+
+class Command(BaseCommand):
+    help = 'Show the hottest functions and queries of profiled requests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=settings.PROFILING_DIR)
+        parser.add_argument('--view', help='Only this URL name')
+        parser.add_argument('--limit', type=int, default=10)
+
+    def handle(self, *args, **options):
+        if not options['dir']:
+            raise CommandError('Set PROFILING_DIR or pass --dir')
+        views = defaultdict(list)
+        for path in glob.glob(os.path.join(options['dir'], '*.json')):
+            try:
+                with open(path) as file:
+                    record = json.load(file)
+            except FileNotFoundError:
+                # Rotated away by a worker since the glob.
+                continue
+            if options['view'] in (None, record['view']):
+                views[record['view']].append(record)
+        if not views:
+            self.stdout.write('No profiles found')
+        for view, records in sorted(
+                views.items(), key=lambda item: -len(item[1])):
+            self.summarize(view, records, options['limit'])
+
+    def summarize(self, view, records, limit):
+        durations = [record['duration'] for record in records]
+        kinds = defaultdict(int)
+        functions = defaultdict(float)
+        queries = defaultdict(lambda: [0, 0.0])
+        for record in records:
+            kinds[record['kind']] += 1
+            for row in record['functions']:
+                functions[row['function']] += row['own']
+            for query in record['queries']:
+                row = queries[normalize(query['sql'])]
+                row[0] += 1
+                row[1] += query['duration']
+        kinds = ', '.join(
+            f'{count} {kind}' for kind, count in sorted(kinds.items())
+        )
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{view}: {len(records)} requests ({kinds}), '
+            f'mean {statistics.mean(durations):.3f}s, '
+            f'max {max(durations):.3f}s'
+        ))
+        self.stdout.write('  functions, own seconds:')
+        for function, own in sorted(
+                functions.items(), key=lambda item: -item[1])[:limit]:
+            self.stdout.write(f'    {own:9.4f}  {function}')
+        self.stdout.write('  queries, total seconds and count:')
+        for sql, (count, total) in sorted(
+                queries.items(), key=lambda item: -item[1][1])[:limit]:
+            self.stdout.write(f'    {total:9.4f} {count:>6}x  {sql[:200]}')
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import repair
+
+
+class Command(BaseCommand):
+    help = 'Recompute comment, post and follower counters and fix drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report drifted rows, do not change them',
+        )
+
+    def handle(self, *args, **options):
+        result = repair(dry_run=options['dry_run'])
+        for name, count in result.items():
+            self.stdout.write(f'{name}: {count}')
+        if options['dry_run']:
+            self.stdout.write('Dry run, nothing was changed')
+        else:
+            self.stdout.write(self.style.SUCCESS('Counters are consistent'))
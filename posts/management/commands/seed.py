@@ -0,0 +1,236 @@
+"""Generate a realistic synthetic dataset for development and benchmarks.
+
+Popularity follows a power law: authors are ranked and the author of
+rank ``r`` is followed, posts and is commented on with a weight of
+``1 / r ** alpha``, so a handful of authors gather most of the followers
+while the long tail has almost none. Every table is filled with
+``bulk_create``; profile, comment and group counters are computed in
+memory and timelines are filled the same way ``import_posts`` fills them.
+"""
+import random
+from collections import Counter
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+
+from posts import timeline
+from posts.cache import bump_feed_version
+from posts.management.commands.import_posts import preserve_dates
+from posts.models import (
+    Comment, Follow, Group, GroupActivity, Post, Profile, User
+)
+
+PASSWORD = 'seed-password'
+
+
+def zipf_weights(count, alpha):
+    return list(accumulate(1 / rank ** alpha for rank in range(1, count + 1)))
+
+
+class Command(BaseCommand):
+    help = 'Fill the database with synthetic users, posts and follows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=50000)
+        parser.add_argument(
+            '--follows', type=int, default=30,
+            help='Average number of authors a user follows',
+        )
+        parser.add_argument(
+            '--alpha', type=float, default=1.2,
+            help='Power-law exponent of author popularity',
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='Posts are spread over this many past days',
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--seed', type=int, default=None,
+            help='Random seed for a reproducible dataset',
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.days = options['days']
+
+        user_ids = self.create_users(options['users'])
+        group_ids = self.create_groups(options['groups'])
+        # Popularity ranks are shuffled so they do not follow the ids.
+        ranked = user_ids[:]
+        self.random.shuffle(ranked)
+        weights = zipf_weights(len(ranked), options['alpha'])
+
+        follows = self.plan_follows(ranked, weights, options['follows'])
+        authors = self.random.choices(
+            ranked, cum_weights=weights, k=options['posts']
+        )
+        commented = Counter(self.random.choices(
+            range(options['posts']),
+            cum_weights=zipf_weights(options['posts'], options['alpha']),
+            k=options['comments'],
+        )) if options['posts'] else Counter()
+
+        with transaction.atomic():
+            self.create_profiles(user_ids, follows, authors)
+            Follow.objects.bulk_create(
+                [Follow(user_id=user, author_id=author)
+                 for user, author in follows],
+                batch_size=self.batch_size
+            )
+        self.stdout.write(f'Follows: {len(follows)}')
+
+        self.group_days, self.group_last = Counter(), {}
+        with preserve_dates():
+            for start in range(0, len(authors), self.batch_size * 10):
+                stop = min(start + self.batch_size * 10, len(authors))
+                with transaction.atomic():
+                    self.create_posts(
+                        authors[start:stop], range(start, stop),
+                        commented, user_ids, group_ids
+                    )
+                self.stdout.write(f'Posts: {stop} of {len(authors)}')
+        self.create_group_stats(group_ids)
+
+        bump_feed_version()
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(user_ids)} users, {len(group_ids)} groups, '
+            f'{len(authors)} posts, {sum(commented.values())} comments, '
+            f'{len(follows)} follows. Password of every user: {PASSWORD}'
+        ))
+
+    def create_users(self, count):
+        password = make_password(PASSWORD)
+        suffix = self.random.randrange(10 ** 6)
+        users = []
+        for number in range(count):
+            profile = self.fake.simple_profile()
+            first_name, _, last_name = profile['name'].partition(' ')
+            users.append(User(
+                username=f'{profile["username"]}_{suffix}_{number}'[:150],
+                first_name=first_name[:30],
+                last_name=last_name[:150],
+                email=profile['mail'],
+                password=password,
+            ))
+        User.objects.bulk_create(users, batch_size=self.batch_size)
+        return list(User.objects.filter(
+            username__in=[user.username for user in users]
+        ).values_list('id', flat=True))
+
+    def create_groups(self, count):
+        suffix = self.random.randrange(10 ** 6)
+        groups = [
+            Group(
+                title=self.fake.catch_phrase()[:200],
+                slug=f'group-{suffix}-{number}',
+                description=self.fake.paragraph(),
+            )
+            for number in range(count)
+        ]
+        Group.objects.bulk_create(groups, batch_size=self.batch_size)
+        return list(Group.objects.filter(
+            slug__in=[group.slug for group in groups]
+        ).values_list('id', flat=True))
+
+    def plan_follows(self, ranked, weights, average):
+        """Pairs (user, author); authors are picked by popularity"""
+        pairs = set()
+        for user in ranked:
+            wanted = min(
+                len(ranked) - 1,
+                int(self.random.expovariate(1 / average)) if average else 0
+            )
+            for author in self.random.choices(
+                    ranked, cum_weights=weights, k=wanted):
+                if author != user:
+                    pairs.add((user, author))
+        return sorted(pairs)
+
+    def create_profiles(self, user_ids, follows, authors):
+        followers = Counter(author for _, author in follows)
+        followings = Counter(user for user, _ in follows)
+        posts = Counter(authors)
+        Profile.objects.bulk_create([
+            Profile(
+                user_id=user_id,
+                posts_count=posts[user_id],
+                followers_count=followers[user_id],
+                followings_count=followings[user_id],
+            )
+            for user_id in user_ids
+        ], batch_size=self.batch_size, ignore_conflicts=True)
+
+    def create_group_stats(self, group_ids):
+        counts = Counter()
+        for (group_id, _), count in self.group_days.items():
+            counts[group_id] += count
+        Group.objects.bulk_update([
+            Group(
+                pk=pk, posts_count=counts[pk],
+                last_post_date=self.group_last.get(pk)
+            )
+            for pk in group_ids
+        ], ['posts_count', 'last_post_date'], batch_size=self.batch_size)
+        GroupActivity.objects.bulk_create([
+            GroupActivity(group_id=group_id, day=day, posts_count=count)
+            for (group_id, day), count in self.group_days.items()
+        ], batch_size=self.batch_size)
+
+    def random_date(self, after=None):
+        start = after or self.now - timedelta(days=self.days)
+        return start + (self.now - start) * self.random.random()
+
+    def create_posts(self, authors, numbers, commented, user_ids, group_ids):
+        posts = [
+            Post(
+                author_id=author,
+                group_id=(
+                    self.random.choice(group_ids)
+                    if group_ids and self.random.random() < 0.7 else None
+                ),
+                text=self.fake.paragraph(nb_sentences=5),
+                pub_date=self.random_date(),
+                comments_count=commented[number],
+            )
+            for author, number in zip(authors, numbers)
+        ]
+        if not connection.features.can_return_ids_from_bulk_insert:
+            # Same as import_posts: ids are assigned inside the transaction.
+            last = Post.objects.aggregate(last=Max('id'))['last'] or 0
+            for number, post in enumerate(posts, start=last + 1):
+                post.id = number
+        Post.objects.bulk_create(posts, batch_size=self.batch_size)
+        for post in posts:
+            if post.group_id:
+                self.group_days[
+                    post.group_id, timezone.localdate(post.pub_date)
+                ] += 1
+                self.group_last[post.group_id] = max(
+                    post.pub_date,
+                    self.group_last.get(post.group_id, post.pub_date)
+                )
+        Comment.objects.bulk_create([
+            Comment(
+                post_id=post.id,
+                author_id=self.random.choice(user_ids),
+                text=self.fake.sentence(),
+                created=self.random_date(after=post.pub_date),
+            )
+            for post in posts
+            for _ in range(post.comments_count)
+        ], batch_size=self.batch_size)
+        timeline.fan_out_many(posts)
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.trending import update
+
+
+class Command(BaseCommand):
+    help = 'Rescore recent posts for the popular feed'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Keep running, rescoring every given number of seconds',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            result = update()
+            self.stdout.write(
+                'scored: {scored}, new: {created}, '
+                'expired: {removed}'.format(**result)
+            )
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.6 on 2026-10-18 02:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='renditions',
+            field=models.TextField(blank=True, default='', editable=False, help_text='JSON with URLs of pregenerated image renditions'),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 2.2.6 on 2026-10-18 02:15
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Copied from posts.search as it was when this migration was written, so
+# later changes there do not change what the migration does.
+INSTALL = {
+    'postgresql': (
+        'CREATE INDEX IF NOT EXISTS post_search_vector_idx '
+        'ON posts_post USING gin (search_vector)',
+        'DROP TRIGGER IF EXISTS post_search_vector_update ON posts_post',
+        "CREATE TRIGGER post_search_vector_update "
+        "BEFORE INSERT OR UPDATE OF text ON posts_post FOR EACH ROW "
+        "EXECUTE PROCEDURE tsvector_update_trigger("
+        "search_vector, 'pg_catalog.russian', text)",
+        "UPDATE posts_post SET search_vector = "
+        "to_tsvector('pg_catalog.russian', text)",
+    ),
+    'sqlite': (
+        "CREATE VIRTUAL TABLE IF NOT EXISTS posts_post_fts USING fts5("
+        "text, content='posts_post', content_rowid='id')",
+        "CREATE TRIGGER IF NOT EXISTS posts_post_fts_insert "
+        "AFTER INSERT ON posts_post BEGIN "
+        "INSERT INTO posts_post_fts(rowid, text) VALUES (new.id, new.text); "
+        "END",
+        "CREATE TRIGGER IF NOT EXISTS posts_post_fts_delete "
+        "AFTER DELETE ON posts_post BEGIN "
+        "INSERT INTO posts_post_fts(posts_post_fts, rowid, text) "
+        "VALUES ('delete', old.id, old.text); "
+        "END",
+        "CREATE TRIGGER IF NOT EXISTS posts_post_fts_update "
+        "AFTER UPDATE OF text ON posts_post BEGIN "
+        "INSERT INTO posts_post_fts(posts_post_fts, rowid, text) "
+        "VALUES ('delete', old.id, old.text); "
+        "INSERT INTO posts_post_fts(rowid, text) VALUES (new.id, new.text); "
+        "END",
+        "INSERT INTO posts_post_fts(posts_post_fts) VALUES ('rebuild')",
+    ),
+}
+UNINSTALL = {
+    'postgresql': (
+        'DROP TRIGGER IF EXISTS post_search_vector_update ON posts_post',
+        'DROP INDEX IF EXISTS post_search_vector_idx',
+    ),
+    'sqlite': (
+        'DROP TRIGGER IF EXISTS posts_post_fts_insert',
+        'DROP TRIGGER IF EXISTS posts_post_fts_delete',
+        'DROP TRIGGER IF EXISTS posts_post_fts_update',
+        'DROP TABLE IF EXISTS posts_post_fts',
+    ),
+}
+
+
+def install_search(apps, schema_editor):
+    for sql in INSTALL.get(schema_editor.connection.vendor, ()):
+        schema_editor.execute(sql)
+
+
+def uninstall_search(apps, schema_editor):
+    for sql in UNINSTALL.get(schema_editor.connection.vendor, ()):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_post_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(install_search, uninstall_search),
+    ]
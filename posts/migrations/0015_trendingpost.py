@@ -0,0 +1,29 @@
+# Generated by Django 2.2.6 on 2026-10-18 02:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingPost',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='posts.Post')),
+                ('pub_date', models.DateTimeField()),
+                ('comments_count', models.PositiveIntegerField(default=0)),
+                ('heat', models.FloatField(default=0)),
+                ('heat_updated', models.DateTimeField()),
+                ('score', models.FloatField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='trendingpost',
+            index=models.Index(fields=['-score', '-post'], name='trending_score_idx'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 2.2.6 on 2026-10-18 02:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Max
+from django.db.models.functions import TruncDate
+
+
+def fill_stats(apps, schema_editor):
+    Group = apps.get_model('posts', 'Group')
+    GroupActivity = apps.get_model('posts', 'GroupActivity')
+    Post = apps.get_model('posts', 'Post')
+    stats = Post.objects.filter(group__isnull=False).order_by().values(
+        'group_id'
+    ).annotate(total=Count('pk'), last=Max('pub_date'))
+    for row in stats:
+        Group.objects.filter(pk=row['group_id']).update(
+            posts_count=row['total'], last_post_date=row['last']
+        )
+    days = Post.objects.filter(group__isnull=False).annotate(
+        day=TruncDate('pub_date')
+    ).order_by().values('group_id', 'day').annotate(total=Count('pk'))
+    GroupActivity.objects.bulk_create([
+        GroupActivity(
+            group_id=row['group_id'], day=row['day'],
+            posts_count=row['total']
+        )
+        for row in days
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_trendingpost'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupActivity',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('posts_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='last_post_date',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='group',
+            index=models.Index(fields=['title', 'id'], name='group_title_idx'),
+        ),
+        migrations.AddField(
+            model_name='groupactivity',
+            name='group',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity', to='posts.Group'),
+        ),
+        migrations.AddConstraint(
+            model_name='groupactivity',
+            constraint=models.UniqueConstraint(fields=('group', 'day'), name='unique_group_activity'),
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
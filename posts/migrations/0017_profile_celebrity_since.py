@@ -0,0 +1,37 @@
+# Generated by Django 2.2.6 on 2026-10-18 14:05
+
+import datetime
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def mark_celebrities(apps, schema_editor):
+    # Their posts were skipped by the fan-out, none is in the timelines.
+    Follow = apps.get_model('posts', 'Follow')
+    Profile = apps.get_model('posts', 'Profile')
+    authors = Follow.objects.order_by().values('author_id').annotate(
+        total=Count('pk')
+    ).filter(total__gt=settings.TIMELINE_FANOUT_LIMIT).values('author_id')
+    Profile.objects.filter(user_id__in=authors).update(
+        celebrity_since=datetime.datetime(
+            1970, 1, 1, tzinfo=datetime.timezone.utc
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_group_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='celebrity_since',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_celebrities, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,31 @@
+import json
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 
 User = get_user_model()
 
 
+class Profile(models.Model):
+    """Denormalized per-author counters"""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='profile'
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    followings_count = models.PositiveIntegerField(default=0)
+    # Set while the posts of the author are not fanned out into timelines,
+    # see posts.timeline.
+    celebrity_since = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return str(self.user)
+
+
 class Group(models.Model):
     title = models.CharField(
         max_length=200,
@@ -20,11 +42,43 @@ class Group(models.Model):
         verbose_name='URL группы',
         help_text='URL группы в адресной строке'
     )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False
+    )
+    last_post_date = models.DateTimeField(
+        blank=True,
+        null=True,
+        editable=False
+    )
+
+    class Meta:
+        indexes = [models.Index(
+            fields=['title', 'id'],
+            name='group_title_idx'
+        ), ]
 
     def __str__(self):
         return self.title
 
 
+class GroupActivity(models.Model):
+    """Number of posts published in a group on a day"""
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        related_name='activity'
+    )
+    day = models.DateField()
+    posts_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(
+            fields=['group', 'day'],
+            name='unique_group_activity'
+        ), ]
+
+
 class Post(models.Model):
     text = models.TextField(
         verbose_name='Текст записи',
@@ -53,13 +107,72 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True, null=True
     )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False
+    )
+    renditions = models.TextField(
+        blank=True,
+        default='',
+        editable=False,
+        help_text='JSON with URLs of pregenerated image renditions'
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False
+    )
+    version = models.PositiveIntegerField(
+        default=1,
+        editable=False,
+        help_text='Bumped whenever the rendered card of the post changes'
+    )
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The stats of the group a post leaves are updated on save.
+        loaded = dict(zip(field_names, values))
+        if 'group_id' in loaded:
+            instance._loaded_group_id = loaded['group_id']
+        return instance
+
+    @property
+    def rendition_urls(self):
+        return json.loads(self.renditions) if self.renditions else {}
+
+    @property
+    def rendition_srcset(self):
+        """``srcset`` of the stored renditions, narrowest first"""
+        urls = self.rendition_urls
+        candidates = []
+        for name, (geometry, _) in settings.POST_IMAGE_RENDITIONS.items():
+            width = geometry.split('x')[0]
+            if name in urls and width.isdigit():
+                candidates.append((int(width), urls[name]))
+        return ', '.join(
+            '%s %sw' % (url, width) for width, url in sorted(candidates)
+        )
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -81,6 +194,12 @@ class Comment(models.Model):
         auto_now_add=True
     )
 
+    class Meta:
+        indexes = [models.Index(
+            fields=['post', 'created', 'id'],
+            name='comment_post_created_idx'
+        ), ]
+
     def __str__(self):
         return self.text
 
@@ -102,3 +221,52 @@ class Follow(models.Model):
             fields=['user', 'author'],
             name='unique_follows'
         ), ]
+        indexes = [models.Index(
+            fields=['author', 'user'],
+            name='follow_author_user_idx'
+        ), ]
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(
+            fields=['user', 'post'],
+            name='unique_timeline_entries'
+        ), ]
+        indexes = [models.Index(
+            fields=['user', '-pub_date', '-post'],
+            name='timeline_user_pub_date_idx'
+        ), ]
+
+
+class TrendingPost(models.Model):
+    """Ranking of a recent post in the popular feed, see posts.trending"""
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trending'
+    )
+    pub_date = models.DateTimeField()
+    comments_count = models.PositiveIntegerField(default=0)
+    heat = models.FloatField(default=0)
+    heat_updated = models.DateTimeField()
+    score = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [models.Index(
+            fields=['-score', '-post'],
+            name='trending_score_idx'
+        ), ]
@@ -0,0 +1,218 @@
+import base64
+import binascii
+import json
+import math
+from collections.abc import Sequence
+from datetime import datetime
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def _resolve(obj, path):
+    """Read a ``field__subfield`` value from a model instance or a dict row"""
+    if isinstance(obj, dict):
+        return obj[path]
+    for attr in path.split('__'):
+        obj = getattr(obj, attr)
+    return obj
+
+
+def _serialize(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+class CursorPage(Sequence):
+    """One page of a keyset paginated queryset"""
+
+    def __init__(self, object_list, paginator, has_next, has_previous,
+                 cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.cursor = cursor
+        self._has_next = has_next and bool(object_list)
+        self._has_previous = has_previous and bool(object_list)
+        self.next_cursor = None
+        self.previous_cursor = None
+        if self._has_next:
+            self.next_cursor = paginator.encode_cursor(object_list[-1], NEXT)
+        if self._has_previous:
+            self.previous_cursor = paginator.encode_cursor(
+                object_list[0], PREVIOUS
+            )
+
+    def __repr__(self):
+        return '<CursorPage of %s objects>' % len(self.object_list)
+
+    @property
+    def key(self):
+        """Identity of the rows on the page, for cache keys.
+
+        Unlike ``cursor`` it does not depend on what the client sent, so
+        made-up cursors cannot add entries beyond one per page of rows.
+        """
+        if not self.object_list:
+            return ''
+        return '%s-%s' % (
+            self.paginator.encode_cursor(self.object_list[0], NEXT),
+            self.paginator.encode_cursor(self.object_list[-1], NEXT),
+        )
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+
+class CursorPaginator:
+    """Keyset paginator with opaque next/previous cursors.
+
+    Pages are selected with a range condition on ``ordering`` instead of
+    ``OFFSET``, so a deep page costs the same as the first one. The last
+    field of ``ordering`` must be unique (usually the primary key).
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id')):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+
+    @property
+    def count(self):
+        """Total number of objects, only queried when somebody asks"""
+        if not hasattr(self, '_count'):
+            self._count = self.object_list.count()
+        return self._count
+
+    def encode_cursor(self, obj, direction):
+        values = [
+            _serialize(_resolve(obj, field.lstrip('-')))
+            for field in self.ordering
+        ]
+        raw = json.dumps([direction, values], separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, values = json.loads(
+                base64.urlsafe_b64decode(padded.encode()).decode()
+            )
+        except (binascii.Error, UnicodeError, ValueError, TypeError):
+            raise InvalidCursor(cursor)
+        if direction not in (NEXT, PREVIOUS) or (
+                not isinstance(values, list)
+                or len(values) != len(self.ordering)):
+            raise InvalidCursor(cursor)
+        try:
+            values = [
+                self._to_python(field.lstrip('-'), value,
+                                unique=index == len(self.ordering) - 1)
+                for index, (field, value) in enumerate(
+                    zip(self.ordering, values)
+                )
+            ]
+        except (ValidationError, ValueError, TypeError):
+            raise InvalidCursor(cursor)
+        return direction, values
+
+    def _field(self, path):
+        """Model or annotation field an ordering path refers to"""
+        query = self.object_list.query
+        if path in query.annotations:
+            return query.annotations[path].output_field
+        opts = self.object_list.model._meta
+        for name in path.split('__'):
+            field = opts.get_field(name)
+            if field.is_relation:
+                opts = field.related_model._meta
+        return field
+
+    def _to_python(self, path, value, unique=False):
+        """Cursor value as the type of its field, ``TypeError`` if it is not"""
+        if value is None or isinstance(value, (bool, dict, list)):
+            raise TypeError(value)
+        # The last field is the unique tie breaker, an integer primary key.
+        if unique and not isinstance(value, int):
+            raise TypeError(value)
+        value = self._field(path).to_python(value)
+        if isinstance(value, (float, Decimal)) and not math.isfinite(value):
+            raise ValueError(value)
+        return value
+
+    def _keyset_filter(self, values, forward):
+        """Build ``(f1, f2, ...) > (v1, v2, ...)`` in the walk direction.
+
+        The leading non-strict condition on the first field lets the
+        database use an index range scan instead of an OR of two scans.
+        """
+        fields = []
+        for field in self.ordering:
+            descending = field.startswith('-')
+            fields.append((field.lstrip('-'), descending != forward))
+        first, ascending = fields[0]
+        condition = Q(**{
+            '%s__%s' % (first, 'gte' if ascending else 'lte'): values[0]
+        })
+        keyset = Q()
+        for index in reversed(range(len(fields))):
+            name, ascending = fields[index]
+            step = Q(**{
+                '%s__%s' % (name, 'gt' if ascending else 'lt'): values[index]
+            })
+            if index < len(fields) - 1:
+                step |= Q(**{name: values[index]}) & keyset
+            keyset = step
+        return condition & keyset
+
+    def page(self, cursor=None):
+        """Return the page after (or before) the given cursor"""
+        direction, values = NEXT, None
+        if cursor:
+            direction, values = self.decode_cursor(cursor)
+        forward = direction == NEXT
+        ordering = self.ordering
+        if not forward:
+            ordering = tuple(
+                field[1:] if field.startswith('-') else '-' + field
+                for field in ordering
+            )
+        queryset = self.object_list.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._keyset_filter(values, forward))
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if forward:
+            return CursorPage(rows, self, has_more, values is not None, cursor)
+        rows.reverse()
+        return CursorPage(rows, self, True, has_more, cursor)
+
+    def get_page(self, cursor=None):
+        """Like ``page`` but fall back to the first page on a bad cursor"""
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
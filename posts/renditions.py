@@ -0,0 +1,75 @@
+"""Image renditions generated off the request path.
+
+After a post with a new image is committed, every size listed in
+``POST_IMAGE_RENDITIONS`` is rendered by sorl-thumbnail on a small
+thread pool and the URLs are stored in ``Post.renditions``. Templates
+only read those URLs and never resize images while rendering.
+"""
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from sorl.thumbnail import get_thumbnail
+
+from yatube.metrics import REGISTRY
+
+from . import images
+from .cache import bump_feed_version
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.RENDITION_WORKERS,
+            thread_name_prefix='renditions'
+        )
+    return _executor
+
+
+def generate(post_id):
+    """Render all renditions of the post image and store their URLs"""
+    post = Post.objects.filter(pk=post_id).only('image').first()
+    if post is None or not post.image:
+        return {}
+    urls = {}
+    for name, (geometry, options) in settings.POST_IMAGE_RENDITIONS.items():
+        if 'format' in options:
+            options = dict(options, format=images.output_format())
+        started = time.perf_counter()
+        urls[name] = get_thumbnail(post.image, geometry, **options).url
+        REGISTRY.observe(
+            'yatube_rendition_seconds', time.perf_counter() - started,
+            rendition=name
+        )
+    Post.objects.filter(pk=post_id, image=post.image.name).update(
+        renditions=json.dumps(urls), version=F('version') + 1
+    )
+    bump_feed_version()
+    return urls
+
+
+def _run(post_id):
+    try:
+        generate(post_id)
+    except Exception:
+        logger.exception('Cannot generate renditions for post %s', post_id)
+    finally:
+        close_old_connections()
+
+
+def schedule(post):
+    """Queue rendition generation once the current transaction commits"""
+    if not settings.RENDITIONS_ASYNC:
+        generate(post.pk)
+        return
+    transaction.on_commit(lambda: _get_executor().submit(_run, post.pk))
@@ -0,0 +1,135 @@
+"""Full-text search over posts.
+
+On PostgreSQL ``Post.search_vector`` is a ``tsvector`` kept up to date by
+a trigger and indexed with GIN. On SQLite an external content FTS5 table
+mirrors ``posts_post.text`` through triggers, so search can be run and
+tested locally. ``install`` creates the database objects and is safe to
+run repeatedly.
+"""
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import DecimalField, F, FloatField, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+
+SEARCH_CONFIG = 'russian'
+SEARCH_ORDERING = ('-rank', '-id')
+
+POSTGRESQL_INSTALL = (
+    'CREATE INDEX IF NOT EXISTS post_search_vector_idx '
+    'ON posts_post USING gin (search_vector)',
+    'DROP TRIGGER IF EXISTS post_search_vector_update ON posts_post',
+    "CREATE TRIGGER post_search_vector_update "
+    "BEFORE INSERT OR UPDATE OF text ON posts_post FOR EACH ROW "
+    "EXECUTE PROCEDURE tsvector_update_trigger("
+    "search_vector, 'pg_catalog.%s', text)" % SEARCH_CONFIG,
+)
+POSTGRESQL_REBUILD = (
+    "UPDATE posts_post SET search_vector = "
+    "to_tsvector('pg_catalog.%s', text)" % SEARCH_CONFIG,
+)
+POSTGRESQL_UNINSTALL = (
+    'DROP TRIGGER IF EXISTS post_search_vector_update ON posts_post',
+    'DROP INDEX IF EXISTS post_search_vector_idx',
+)
+
+SQLITE_INSTALL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS posts_post_fts USING fts5("
+    "text, content='posts_post', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS posts_post_fts_insert "
+    "AFTER INSERT ON posts_post BEGIN "
+    "INSERT INTO posts_post_fts(rowid, text) VALUES (new.id, new.text); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS posts_post_fts_delete "
+    "AFTER DELETE ON posts_post BEGIN "
+    "INSERT INTO posts_post_fts(posts_post_fts, rowid, text) "
+    "VALUES ('delete', old.id, old.text); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS posts_post_fts_update "
+    "AFTER UPDATE OF text ON posts_post BEGIN "
+    "INSERT INTO posts_post_fts(posts_post_fts, rowid, text) "
+    "VALUES ('delete', old.id, old.text); "
+    "INSERT INTO posts_post_fts(rowid, text) VALUES (new.id, new.text); "
+    "END",
+)
+SQLITE_REBUILD = (
+    "INSERT INTO posts_post_fts(posts_post_fts) VALUES ('rebuild')",
+)
+SQLITE_UNINSTALL = (
+    'DROP TRIGGER IF EXISTS posts_post_fts_insert',
+    'DROP TRIGGER IF EXISTS posts_post_fts_delete',
+    'DROP TRIGGER IF EXISTS posts_post_fts_update',
+    'DROP TABLE IF EXISTS posts_post_fts',
+)
+
+STATEMENTS = {
+    'postgresql': {
+        'install': POSTGRESQL_INSTALL,
+        'rebuild': POSTGRESQL_REBUILD,
+        'uninstall': POSTGRESQL_UNINSTALL,
+    },
+    'sqlite': {
+        'install': SQLITE_INSTALL,
+        'rebuild': SQLITE_REBUILD,
+        'uninstall': SQLITE_UNINSTALL,
+    },
+}
+
+
+def _execute(db, *steps):
+    statements = STATEMENTS.get(db.vendor)
+    if statements is None:
+        return
+    with db.cursor() as cursor:
+        for step in steps:
+            for sql in statements[step]:
+                cursor.execute(sql)
+
+
+def install(db, rebuild=False):
+    """Create the search index and the triggers keeping it in sync.
+
+    SQLite drops triggers whenever a migration rebuilds ``posts_post``,
+    so this also runs after every ``migrate``.
+    """
+    steps = ['install', 'rebuild'] if rebuild else ['install']
+    _execute(db, *steps)
+
+
+def uninstall(db):
+    _execute(db, 'uninstall')
+
+
+def _fts5_query(query):
+    """Quote every word so user input cannot break the FTS5 syntax"""
+    return ' '.join(
+        '"%s"' % word.replace('"', '""') for word in query.split()
+    )
+
+
+def search_posts(query, queryset):
+    """Posts matching ``query``, annotated with a ``rank`` (higher first)"""
+    if connection.vendor == 'postgresql':
+        search_query = SearchQuery(query, config=SEARCH_CONFIG)
+        # ts_rank is a float4 that does not survive the trip through the
+        # cursor exactly, a fixed scale numeric compares as sent.
+        return queryset.filter(search_vector=search_query).annotate(
+            rank=Cast(
+                SearchRank(F('search_vector'), search_query),
+                DecimalField(max_digits=15, decimal_places=9)
+            )
+        )
+    if connection.vendor == 'sqlite':
+        match = _fts5_query(query)
+        return queryset.filter(id__in=RawSQL(
+            'SELECT rowid FROM posts_post_fts WHERE posts_post_fts MATCH %s',
+            (match,)
+        )).annotate(rank=RawSQL(
+            'SELECT -bm25(posts_post_fts) FROM posts_post_fts '
+            'WHERE posts_post_fts MATCH %s AND rowid = posts_post.id',
+            (match,),
+            output_field=FloatField()
+        ))
+    return queryset.filter(text__icontains=query).annotate(
+        rank=Value(0.0, output_field=FloatField())
+    )
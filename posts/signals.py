@@ -0,0 +1,134 @@
+from django.db import connections
+from django.db.models import F
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+
+from . import directory, following, search, timeline
+from .cards import touch
+from .cache import bump_feed_version, bump_follows_version
+from .counters import bump
+from .models import Comment, Follow, Group, Post, Profile, User
+
+
+@receiver(post_save, sender=User)
+def create_profile(sender, instance, created, **kwargs):
+    if created:
+        Profile.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, **kwargs):
+    if created:
+        bump(Profile.objects.filter(user_id=instance.author_id),
+             'posts_count', 1)
+        timeline.fan_out(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    bump(Profile.objects.filter(user_id=instance.author_id),
+         'posts_count', -1)
+
+
+@receiver(post_save, sender=Post)
+def post_group_stats(sender, instance, created, **kwargs):
+    if created:
+        previous = None
+    elif hasattr(instance, '_loaded_group_id'):
+        previous = instance._loaded_group_id
+    else:
+        # Saved without being loaded, the old group is unknown.
+        return
+    if previous != instance.group_id:
+        if previous is not None:
+            directory.post_removed(previous, instance.pub_date)
+        if instance.group_id is not None:
+            directory.post_added(instance.group_id, instance.pub_date)
+    instance._loaded_group_id = instance.group_id
+
+
+@receiver(post_delete, sender=Post)
+def post_group_deleted(sender, instance, **kwargs):
+    group_id = getattr(instance, '_loaded_group_id', instance.group_id)
+    if group_id is not None:
+        directory.post_removed(group_id, instance.pub_date)
+
+
+@receiver(pre_save, sender=Post)
+def post_changed(sender, instance, update_fields, **kwargs):
+    if instance._state.adding or (
+            update_fields is not None and 'version' not in update_fields):
+        return
+    # Added in SQL: comments and renditions bump it concurrently.
+    instance.version = F('version') + 1
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        # The card shows the number of comments, so it is rendered again.
+        bump(Post.objects.filter(pk=instance.post_id), 'comments_count', 1,
+             version=F('version') + 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    bump(Post.objects.filter(pk=instance.post_id), 'comments_count', -1,
+         version=F('version') + 1)
+
+
+@receiver(post_save, sender=Group)
+def group_changed(sender, instance, created, **kwargs):
+    if not created:
+        touch(Post.objects.filter(group=instance))
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    touch(Post.objects.filter(group=instance))
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        bump(Profile.objects.filter(user_id=instance.author_id),
+             'followers_count', 1)
+        bump(Profile.objects.filter(user_id=instance.user_id),
+             'followings_count', 1)
+        timeline.promoted(instance.author_id)
+        timeline.backfill(instance.user, instance.author)
+        following.changed(instance.user_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    bump(Profile.objects.filter(user_id=instance.author_id),
+         'followers_count', -1)
+    bump(Profile.objects.filter(user_id=instance.user_id),
+         'followings_count', -1)
+    timeline.prune(instance.user_id, instance.author_id)
+    timeline.demoted(instance.author_id)
+    following.changed(instance.user_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_feeds(sender, **kwargs):
+    bump_feed_version()
+
+
+def install_search(sender, using, **kwargs):
+    search.install(connections[using])
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follows(sender, instance, **kwargs):
+    bump_follows_version(instance.user_id)
+    bump_follows_version(instance.author_id)
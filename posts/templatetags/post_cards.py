@@ -0,0 +1,15 @@
+from django import template
+
+from .. import cards
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts):
+    return cards.render_cards(list(posts), context.get('user'))
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, post):
+    return cards.render_cards([post], context.get('user'))[0]
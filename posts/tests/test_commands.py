@@ -0,0 +1,164 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import LiveServerTestCase, TestCase, override_settings
+
+from ..models import Comment, Follow, Post, Profile, TimelineEntry, User
+
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+RECORDS = [
+    {'type': 'user', 'username': 'ozzy'},
+    {'type': 'user', 'username': 'tony'},
+    {'type': 'group', 'slug': 'rock', 'title': 'Рок'},
+    {'type': 'follow', 'user': 'tony', 'author': 'ozzy'},
+    {'type': 'post', 'author': 'ozzy', 'group': 'rock',
+     'text': 'Первая запись', 'pub_date': '2020-01-01T10:00:00+00:00',
+     'comments': [{'author': 'tony', 'text': 'Круто'}]},
+    {'type': 'post', 'author': 'ozzy', 'text': 'Вторая запись'},
+    {'type': 'post', 'author': 'ghost', 'text': 'Без автора'},
+]
+
+
+class ImportPostsCommandTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.path = os.path.join(TEMP_DIR, 'import.jsonl')
+        with open(self.path, 'w') as source:
+            for record in RECORDS:
+                source.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def test_import_creates_objects(self):
+        """Импорт создаёт пользователей, записи, комментарии и подписки"""
+        call_command(
+            'import_posts', self.path, chunk_size=2, stdout=StringIO()
+        )
+        author = User.objects.get(username='ozzy')
+        first = Post.objects.get(text='Первая запись')
+
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(first.group.slug, 'rock')
+        self.assertEqual(first.pub_date.year, 2020)
+        self.assertEqual(first.comments_count, 1)
+        self.assertTrue(Comment.objects.filter(post=first).exists())
+        self.assertTrue(Follow.objects.filter(author=author).exists())
+        self.assertEqual(Profile.objects.get(user=author).posts_count, 2)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user__username='tony').count(), 2
+        )
+        self.assertFalse(os.path.exists(self.path + '.checkpoint'))
+
+    def test_import_resumes_from_checkpoint(self):
+        """Прерванный импорт продолжается с сохранённого места"""
+        with open(self.path, 'rb') as source:
+            for _ in range(5):
+                source.readline()
+            offset = source.tell()
+        with open(self.path + '.checkpoint', 'w') as checkpoint:
+            json.dump({'offset': offset, 'stats': {}}, checkpoint)
+        User.objects.create_user(username='ozzy')
+
+        call_command('import_posts', self.path, stdout=StringIO())
+
+        self.assertEqual(
+            list(Post.objects.values_list('text', flat=True)),
+            ['Вторая запись']
+        )
+
+    def test_import_of_empty_file(self):
+        """Пустой файл импортируется без ошибок"""
+        open(self.path, 'w').close()
+        call_command('import_posts', self.path, stdout=StringIO())
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_import_skips_celebrities_by_imported_follows(self):
+        """Ленты импорта не заполняются постами популярных авторов"""
+        with open(self.path, 'a') as source:
+            source.write(json.dumps(
+                {'type': 'user', 'username': 'geezer'}
+            ) + '\n')
+            source.write(json.dumps(
+                {'type': 'follow', 'user': 'geezer', 'author': 'ozzy'}
+            ) + '\n')
+        call_command('import_posts', self.path, stdout=StringIO())
+        self.assertEqual(
+            Follow.objects.filter(author__username='ozzy').count(), 2
+        )
+        self.assertFalse(TimelineEntry.objects.exists())
+
+
+class SeedCommandTests(TestCase):
+    def test_seed_keeps_counters_consistent(self):
+        """Сгенерированные данные согласованы со счётчиками и лентами"""
+        call_command(
+            'seed', users=20, groups=2, posts=40, comments=30, follows=5,
+            seed=1, stdout=StringIO()
+        )
+        output = StringIO()
+        call_command('repair_counters', dry_run=True, stdout=output)
+
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Post.objects.count(), 40)
+        self.assertEqual(Comment.objects.count(), 30)
+        self.assertIn('profiles: 0', output.getvalue())
+        self.assertIn('posts: 0', output.getvalue())
+        self.assertIn('groups: 0', output.getvalue())
+        follow = Follow.objects.first()
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=follow.user).count(),
+            Post.objects.filter(
+                author__following__user=follow.user
+            ).count()
+        )
+
+    def test_benchmark_covers_routes(self):
+        """Нагрузочный прогон отвечает без ошибок и пишет отчёт"""
+        call_command(
+            'seed', users=10, groups=2, posts=20, comments=10, follows=3,
+            seed=2, stdout=StringIO()
+        )
+        with tempfile.NamedTemporaryFile(suffix='.json') as report:
+            call_command(
+                'benchmark_routes', requests=40, warmup=0, seed=3,
+                json=report.name, stdout=StringIO()
+            )
+            result = json.load(report)
+
+        self.assertEqual(result['total']['count'], 40)
+        self.assertEqual(result['total']['errors'], 0)
+        self.assertIn('index', result['routes'])
+
+
+# The replicas of the test run are empty databases, not copies.
+@override_settings(DATABASE_REPLICAS=[])
+class BenchmarkOverHttpTests(LiveServerTestCase):
+    def test_benchmark_over_http(self):
+        """Прогон через --url обращается к запущенному серверу"""
+        call_command(
+            'seed', users=10, groups=2, posts=20, comments=10, follows=3,
+            seed=2, stdout=StringIO()
+        )
+        with tempfile.NamedTemporaryFile(suffix='.json') as report:
+            call_command(
+                'benchmark_routes', requests=100, warmup=0, seed=3,
+                url=self.live_server_url, json=report.name,
+                stdout=StringIO()
+            )
+            result = json.load(report)
+
+        self.assertEqual(result['total']['count'], 100)
+        self.assertEqual(result['total']['errors'], 0)
+        self.assertIsNone(result['total']['queries'])
+        # Comments are posted by logged in clients with a CSRF token.
+        added = result['routes']['add_comment']['count']
+        self.assertEqual(Comment.objects.count(), 10 + added)
@@ -0,0 +1,85 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..counters import repair
+from ..models import Group, GroupActivity, Post, User
+
+
+class GroupDirectoryTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.rock = Group.objects.create(title='Рок', slug='rock')
+        cls.jazz = Group.objects.create(title='Джаз', slug='jazz')
+        cls.guest_client = Client()
+
+    def setUp(self):
+        cache.clear()
+
+    def publish(self, group, count=1):
+        return [
+            Post.objects.create(text='Пост', author=self.author, group=group)
+            for _ in range(count)
+        ]
+
+    def assert_stats(self, group, count, last_post):
+        group.refresh_from_db()
+        self.assertEqual(group.posts_count, count)
+        self.assertEqual(
+            group.last_post_date, last_post and last_post.pub_date
+        )
+        activity = GroupActivity.objects.filter(
+            group=group, day=timezone.localdate()
+        ).values_list('posts_count', flat=True).first()
+        self.assertEqual(activity or 0, count)
+
+    def test_stats_follow_posts(self):
+        """Статистика групп обновляется при публикации, переносе и удалении"""
+        first, second = self.publish(self.rock, 2)
+        self.assert_stats(self.rock, 2, second)
+
+        moved = Post.objects.get(pk=second.pk)
+        moved.group = self.jazz
+        moved.save()
+        self.assert_stats(self.rock, 1, first)
+        self.assert_stats(self.jazz, 1, second)
+
+        moved.text = 'Правка'
+        moved.save()
+        self.assert_stats(self.jazz, 1, second)
+
+        Post.objects.get(pk=second.pk).delete()
+        self.assert_stats(self.jazz, 0, None)
+        self.assert_stats(self.rock, 1, first)
+
+    def test_directory_is_one_query(self):
+        """Каталог групп со статистикой читается одним запросом"""
+        self.publish(self.rock, 3)
+        old = self.publish(self.jazz)[0]
+        GroupActivity.objects.filter(group=self.jazz).update(
+            day=timezone.localdate() - timedelta(days=30)
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(reverse('groups'))
+        self.assertEqual(len(queries), 1)
+        jazz, rock = response.context['page']
+        self.assertEqual((rock.posts_count, rock.recent_posts_count), (3, 3))
+        self.assertEqual((jazz.posts_count, jazz.recent_posts_count), (1, 0))
+        self.assertEqual(jazz.last_post_date, old.pub_date)
+
+    def test_repair_fixes_group_stats(self):
+        """repair_counters исправляет статистику групп"""
+        post = self.publish(self.rock)[0]
+        Group.objects.update(posts_count=7, last_post_date=None)
+        GroupActivity.objects.all().delete()
+
+        self.assertEqual(repair()['groups'], 2)
+        self.assert_stats(self.rock, 1, post)
+        self.assertEqual(repair(dry_run=True)['groups'], 0)
@@ -1,15 +1,28 @@
 import shutil
 import tempfile
 from http import HTTPStatus
+from io import BytesIO
+from unittest import mock
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
-from ..models import Group, Post, User
+from .. import images
+from ..forms import PostForm
+from ..models import Comment, Group, Post, User
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -41,17 +54,9 @@ class PostFormTests(TestCase):
     def test_form_creates_new_post(self):
         """При отправке формы создаётся новая запись"""
         count_posts = Post.objects.count()
-        small_gif = (
-            b'\x47\x49\x46\x38\x39\x61\x02\x00'
-            b'\x01\x00\x80\x00\x00\x00\x00\x00'
-            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
-            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
-            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
-            b'\x0A\x00\x3B'
-        )
         uploaded = SimpleUploadedFile(
             name='small.gif',
-            content=small_gif,
+            content=SMALL_GIF,
             content_type='image/gif'
         )
         form_data = {
@@ -69,7 +74,9 @@ class PostFormTests(TestCase):
                 text='Новый тестовый текст',
                 group=PostFormTests.group,
                 author=PostFormTests.user,
-                image='posts/small.gif'
+                image='posts/small.%s' % images.EXTENSIONS[
+                    images.output_format()
+                ]
             ).exists()
         )
 
@@ -99,3 +106,92 @@ class PostFormTests(TestCase):
             ).exists()
         )
         self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_edit_keeps_concurrent_counters(self):
+        """Редактирование не затирает комментарий, добавленный во время него"""
+        post = Post.objects.create(text='Текст', author=self.user)
+        version = Post.objects.get(pk=post.pk).version
+        clean = PostForm.clean
+
+        def comment_meanwhile(form):
+            Comment.objects.create(post=post, author=self.user, text='Да')
+            return clean(form)
+
+        with mock.patch.object(PostForm, 'clean', comment_meanwhile):
+            self.authorized_client.post(
+                reverse('post_edit', kwargs={
+                    'username': 'Ozzy', 'post_id': post.id
+                }),
+                data={'text': 'Изменённый текст'}
+            )
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Изменённый текст')
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.version, version + 2)
+
+    @override_settings(RENDITIONS_ASYNC=False)
+    def test_renditions_are_generated_for_uploaded_image(self):
+        """Для загруженной картинки заранее готовятся превью"""
+        uploaded = SimpleUploadedFile(
+            name='rendition.gif',
+            content=SMALL_GIF,
+            content_type='image/gif'
+        )
+        self.authorized_client.post(
+            reverse('new_post'),
+            data={'text': 'Пост с картинкой', 'image': uploaded},
+        )
+        post = Post.objects.get(text='Пост с картинкой')
+        card_url = post.rendition_urls['card']
+        self.assertTrue(card_url.startswith(settings.MEDIA_URL))
+
+        response = self.authorized_client.get(reverse(
+            'post', kwargs={'username': 'Ozzy', 'post_id': post.id}
+        ))
+        self.assertContains(response, card_url)
+        self.assertContains(response, post.rendition_urls['card_large'])
+        self.assertContains(response, 'srcset=')
+
+    @override_settings(POST_IMAGE_MAX_SIZE=100, POST_IMAGE_FORMAT='JPEG')
+    def test_uploaded_image_is_reencoded(self):
+        """Картинка уменьшается и пересохраняется без метаданных"""
+        exif = Image.Exif()
+        exif[0x010F] = 'Phone'
+        buffer = BytesIO()
+        Image.new('RGB', (400, 200), 'red').save(buffer, 'PNG', exif=exif)
+        uploaded = SimpleUploadedFile(
+            name='photo.png',
+            content=buffer.getvalue(),
+            content_type='image/png'
+        )
+        self.authorized_client.post(
+            reverse('new_post'),
+            data={'text': 'Фото с телефона', 'image': uploaded},
+        )
+        post = Post.objects.get(text='Фото с телефона')
+
+        self.assertEqual(post.image.name, 'posts/photo.jpg')
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(image.size, (100, 50))
+            self.assertNotIn('exif', image.info)
+
+    @override_settings(POST_IMAGE_MAX_DIMENSION=1)
+    def test_too_large_image_is_rejected(self):
+        """Слишком большая картинка не принимается"""
+        uploaded = SimpleUploadedFile(
+            name='wide.gif',
+            content=SMALL_GIF,
+            content_type='image/gif'
+        )
+        response = self.authorized_client.post(
+            reverse('new_post'),
+            data={'text': 'Широкая картинка', 'image': uploaded},
+        )
+        self.assertFormError(
+            response, 'form', 'image',
+            'Картинка больше 1 пикселей по длинной стороне'
+        )
+        self.assertFalse(
+            Post.objects.filter(text='Широкая картинка').exists()
+        )
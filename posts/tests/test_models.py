@@ -1,6 +1,9 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 
-from ..models import Group, Post, User
+from ..models import Comment, Follow, Group, Post, Profile, User
 
 
 class PostsModelTest(TestCase):
@@ -56,3 +59,77 @@ class PostsModelTest(TestCase):
         for expected_name, result_str in expected_str.items():
             with self.subTest(expected_name=expected_name):
                 self.assertEqual(expected_name, result_str)
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Ozzy')
+        cls.reader = User.objects.create_user(username='Tony')
+        cls.post = Post.objects.create(
+            text='Тестовый текст', author=cls.author
+        )
+
+    def test_write_paths_update_counters(self):
+        """Счётчики меняются вместе с комментариями и подписками"""
+        comment = Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        self.assertEqual(
+            Profile.objects.get(user=self.author).posts_count, 1
+        )
+        self.assertEqual(
+            Profile.objects.get(user=self.author).followers_count, 1
+        )
+        self.assertEqual(
+            Profile.objects.get(user=self.reader).followings_count, 1
+        )
+
+        comment.delete()
+        follow.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+        self.assertEqual(
+            Profile.objects.get(user=self.author).followers_count, 0
+        )
+
+    def test_repair_counters_fixes_drift(self):
+        """Команда repair_counters исправляет расхождения"""
+        Post.objects.filter(pk=self.post.pk).update(comments_count=5)
+        Profile.objects.filter(user=self.author).update(posts_count=7)
+        Profile.objects.filter(user=self.reader).delete()
+
+        call_command('repair_counters', stdout=StringIO())
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+        self.assertEqual(
+            Profile.objects.get(user=self.author).posts_count, 1
+        )
+        self.assertTrue(Profile.objects.filter(user=self.reader).exists())
+
+    def test_repair_counters_matches_profiles_by_user(self):
+        """repair_counters считает по пользователю, а не по id профиля"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Profile.objects.all().delete()
+        Profile.objects.bulk_create([
+            Profile(pk=self.reader.pk, user=self.author),
+            Profile(pk=self.author.pk, user=self.reader),
+        ])
+
+        call_command('repair_counters', stdout=StringIO())
+
+        author = Profile.objects.get(user=self.author)
+        reader = Profile.objects.get(user=self.reader)
+        self.assertEqual(
+            (author.posts_count, author.followers_count,
+             author.followings_count), (1, 1, 0)
+        )
+        self.assertEqual(
+            (reader.posts_count, reader.followers_count,
+             reader.followings_count), (0, 0, 1)
+        )
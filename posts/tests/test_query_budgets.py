@@ -0,0 +1,74 @@
+from unittest import mock
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from yatube.query_budget import get_budget
+
+from .. import urls, views
+from ..models import Comment, Follow, Group, Post, User
+
+
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            description='Описание тестовой группы',
+            slug='test-slug'
+        )
+        cls.authors = [
+            User.objects.create_user(username=f'author{i}') for i in range(5)
+        ]
+        cls.reader = User.objects.create_user(username='reader')
+        for i in range(settings.PAGINATE_BY * 2):
+            post = Post.objects.create(
+                text=f'Пост {i}',
+                author=cls.authors[i % len(cls.authors)],
+                group=cls.group,
+            )
+            Comment.objects.create(post=post, author=cls.reader, text='Ком')
+        for author in cls.authors[1:]:
+            Follow.objects.create(user=cls.reader, author=author)
+            Comment.objects.create(post=post, author=author, text='Ком')
+        cls.post = post
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+
+    def url_kwargs(self, pattern):
+        values = {
+            'slug': self.group.slug,
+            'username': self.post.author.username,
+            'post_id': self.post.id,
+        }
+        return {name: values[name] for name in pattern.pattern.converters}
+
+    def test_every_view_declares_budget(self):
+        """Каждая страница posts.urls объявляет бюджет запросов"""
+        for pattern in urls.urlpatterns:
+            with self.subTest(name=pattern.name):
+                self.assertIsNotNone(get_budget(pattern.callback))
+
+    def test_views_stay_within_budget(self):
+        """Страницы не превышают бюджет запросов"""
+        for pattern in urls.urlpatterns:
+            url = reverse(pattern.name, kwargs=self.url_kwargs(pattern))
+            budget = get_budget(pattern.callback)
+            with self.subTest(name=pattern.name):
+                with CaptureQueriesContext(connection) as queries:
+                    self.reader_client.get(url)
+                self.assertLessEqual(
+                    len(queries), budget,
+                    '\n'.join(query['sql'] for query in queries)
+                )
+
+    def test_middleware_logs_exceeded_budget(self):
+        """Превышение бюджета попадает в лог"""
+        with mock.patch.object(views.index, 'query_budget', 0):
+            with self.assertLogs('yatube.query_budget', 'WARNING') as logs:
+                self.reader_client.get('/')
+        self.assertIn('index', logs.output[0])
@@ -0,0 +1,94 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import trending
+from ..models import Comment, Follow, Group, Post, User
+
+SQLITE_FULL_SCAN = re.compile(r'^SCAN (TABLE )?posts_\w+$')
+
+
+class QueryPlanTests(TestCase):
+    """Main queries of the views must be served by indexes.
+
+    Every ordered query a view runs is re-explained and the test fails
+    when the plan reads a posts table sequentially or sorts the result.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            description='Описание тестовой группы',
+            slug='test-slug'
+        )
+        cls.authors = [
+            User.objects.create_user(username=f'author{i}') for i in range(5)
+        ]
+        cls.reader = User.objects.create_user(username='reader')
+        Post.objects.bulk_create([
+            Post(
+                text=f'Пост {i}',
+                author=cls.authors[i % len(cls.authors)],
+                group=cls.group if i % 2 else None,
+            )
+            for i in range(settings.PAGINATE_BY * 5)
+        ])
+        cls.post = Post.objects.filter(author=cls.authors[0]).first()
+        Comment.objects.bulk_create([
+            Comment(post=cls.post, author=cls.reader, text=f'Ком {i}')
+            for i in range(20)
+        ])
+        for author in cls.authors[:3]:
+            Follow.objects.create(user=cls.reader, author=author)
+        trending.update()
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                return [row[-1] for row in cursor.fetchall()]
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('EXPLAIN ' + sql)
+            return [row[0] for row in cursor.fetchall()]
+
+    def assert_indexed(self, plan):
+        for line in plan:
+            if connection.vendor == 'sqlite':
+                self.assertNotIn('USE TEMP B-TREE', line, plan)
+                self.assertIsNone(SQLITE_FULL_SCAN.match(line), plan)
+            else:
+                self.assertNotIn('Seq Scan on posts_', line, plan)
+                self.assertNotRegex(line, r'^\s*(->\s*)?Sort\b', plan)
+
+    def test_views_use_indexes(self):
+        """Основные запросы страниц используют индексы"""
+        urls = [
+            reverse('index'),
+            reverse('popular'),
+            reverse('groups'),
+            reverse('group', kwargs={'slug': self.group.slug}),
+            reverse('profile', kwargs={'username': self.authors[0]}),
+            reverse('follow_index'),
+            reverse('post', kwargs={
+                'username': self.authors[0], 'post_id': self.post.id
+            }),
+        ]
+        for url in urls:
+            with CaptureQueriesContext(connection) as queries:
+                self.reader_client.get(url)
+            ordered = [
+                query['sql'] for query in queries
+                if 'ORDER BY' in query['sql']
+            ]
+            self.assertTrue(ordered, url)
+            for sql in ordered:
+                with self.subTest(url=url, sql=sql):
+                    self.assert_indexed(self.explain(sql))
@@ -0,0 +1,74 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import trending
+from ..models import Comment, Post, TrendingPost, User
+
+
+class TrendingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.posts = [
+            Post.objects.create(text=f'Пост {i}', author=cls.author)
+            for i in range(settings.PAGINATE_BY + 2)
+        ]
+        cls.guest_client = Client()
+
+    def setUp(self):
+        cache.clear()
+
+    def comment(self, post, count=1):
+        for _ in range(count):
+            Comment.objects.create(post=post, author=self.reader, text='Ком')
+
+    def test_posts_are_ranked_by_comments(self):
+        """Обсуждаемые записи идут первыми, лента листается курсором"""
+        self.comment(self.posts[0], 3)
+        self.comment(self.posts[1], 1)
+        trending.update()
+
+        response = self.guest_client.get(reverse('popular'))
+        page = response.context['page']
+        self.assertEqual(len(page), settings.PAGINATE_BY)
+        self.assertEqual(response.context['posts'][:2], self.posts[:2])
+
+        response = self.guest_client.get(
+            reverse('popular'), {'cursor': page.next_cursor}
+        )
+        self.assertEqual(len(response.context['page']), 2)
+
+    def test_ranking_follows_new_comments(self):
+        """Новые комментарии поднимают запись после пересчёта"""
+        trending.update()
+        url = reverse('popular')
+        etag = self.guest_client.get(url)['ETag']
+        self.comment(self.posts[0], 2)
+
+        trending.update()
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['posts'][0], self.posts[0])
+
+    def test_heat_decays_and_old_posts_expire(self):
+        """Вес комментариев затухает, старые записи выпадают из ленты"""
+        self.comment(self.posts[0], 4)
+        now = timezone.now()
+        trending.update(now)
+        half_life = timedelta(hours=settings.TRENDING_HALF_LIFE_HOURS)
+        trending.update(now + half_life)
+        row = TrendingPost.objects.get(post=self.posts[0])
+        self.assertAlmostEqual(row.heat, 2)
+
+        result = trending.update(
+            now + timedelta(days=settings.TRENDING_WINDOW_DAYS + 1)
+        )
+        self.assertEqual(result['scored'], 0)
+        self.assertFalse(TrendingPost.objects.exists())
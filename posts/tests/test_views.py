@@ -1,15 +1,31 @@
+import base64
+import json
 import shutil
 import tempfile
+from array import array
+from decimal import Decimal
 
 from django import forms
 from django.conf import settings
-from django.core.cache import cache
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache, caches
 from django.core.cache.utils import make_template_fragment_key
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import DecimalField, Value
+from django.db.models.functions import Cast
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings
+)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Follow, Group, Post, User
+from ..cards import card_key
+from .. import following
+from ..following import is_following
+from ..models import Comment, Follow, Group, Post, TimelineEntry, User
+from ..paginator import CursorPaginator
+from ..search import SEARCH_ORDERING
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -30,6 +46,7 @@ class PostsPagesTests(TestCase):
             description='Описание побочной тестовой группы',
             slug='test-slug-empty'
         )
+        cls.guest_client = Client()
         cls.user = User.objects.create_user(username='Ozzy')
         cls.authorized_client = Client()
         cls.authorized_client.force_login(cls.user)
@@ -72,6 +89,9 @@ class PostsPagesTests(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
         super().tearDownClass()
 
+    def setUp(self):
+        cache.clear()
+
     def check_post_fields(self, post):
         """Метод проверки полей поста"""
         post_text = post.text
@@ -220,6 +240,49 @@ class PostsPagesTests(TestCase):
         self.assertEqual(context_author, self.user)
         self.assertEqual(count, context_count)
 
+    def test_post_comments_are_paginated(self):
+        """Комментарии выводятся страницами с авторами в одном запросе"""
+        Comment.objects.bulk_create([
+            Comment(post=self.post, author=self.user_follower, text=f'К {i}')
+            for i in range(settings.COMMENTS_PAGINATE_BY * 3)
+        ])
+        url = reverse('post', args=[self.user.username, self.post.id])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(url)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), settings.COMMENTS_PAGINATE_BY)
+        self.assertEqual(comments[0].text, 'К 0')
+        self.assertTrue(comments.has_next())
+        self.assertEqual(
+            sum('posts_comment' in query['sql'] for query in queries), 1
+        )
+
+        response = self.guest_client.get(url, {'order': 'newest'})
+        self.assertEqual(
+            response.context['comments'][0].text,
+            f'К {settings.COMMENTS_PAGINATE_BY * 3 - 1}'
+        )
+
+    def test_post_comments_fragment_loads_more(self):
+        """Фрагмент «Показать ещё» отдаёт следующую страницу"""
+        Comment.objects.bulk_create([
+            Comment(post=self.post, author=self.user_follower, text=f'К {i}')
+            for i in range(settings.COMMENTS_PAGINATE_BY + 1)
+        ])
+        response = self.guest_client.get(
+            reverse('post', args=[self.user.username, self.post.id])
+        )
+        response = self.guest_client.get(
+            reverse('post_comments', args=[self.user.username, self.post.id]),
+            {'cursor': response.context['comments'].next_cursor}
+        )
+        self.assertTemplateUsed(response, 'includes/comment_list.html')
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            [f'К {settings.COMMENTS_PAGINATE_BY}']
+        )
+        self.assertNotContains(response, 'Показать ещё')
+
     def test_paginator(self):
         """Паджинатор работает правильно"""
         second_page_count = 2
@@ -236,25 +299,134 @@ class PostsPagesTests(TestCase):
             f'/group/{self.group_target.slug}/',
             f'/{self.user.username}/',
         ]
-        pages = {
-            '?page=1': settings.PAGINATE_BY,
-            '?page=2': Post.objects.count() - settings.PAGINATE_BY,
-        }
+        second_page = Post.objects.count() - settings.PAGINATE_BY
         for url in urls:
-            for page, quantity in pages.items():
-                with self.subTest():
-                    response = self.authorized_client.get(url + page)
-                    self.assertEqual(
-                        len(response.context['page'].object_list), quantity
-                    )
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                page = response.context['page']
+                self.assertEqual(
+                    len(page.object_list), settings.PAGINATE_BY
+                )
+                self.assertTrue(page.has_next())
+                self.assertFalse(page.has_previous())
+
+                response = self.authorized_client.get(
+                    url, {'cursor': page.next_cursor}
+                )
+                next_page = response.context['page']
+                self.assertEqual(len(next_page.object_list), second_page)
+                self.assertFalse(next_page.has_next())
+                self.assertTrue(next_page.has_previous())
+
+                response = self.authorized_client.get(
+                    url, {'cursor': next_page.previous_cursor}
+                )
+                self.assertEqual(
+                    list(response.context['page'].object_list),
+                    list(page.object_list)
+                )
+
+    def test_paginator_ignores_broken_cursor(self):
+        """Испорченный курсор открывает первую страницу"""
+        response = self.authorized_client.get(
+            reverse('index'), {'cursor': 'не-курсор'}
+        )
+        self.assertEqual(len(response.context['page']), 1)
+
+    def test_paginator_ignores_cursor_of_wrong_types(self):
+        """Курсор со значениями не тех типов открывает первую страницу"""
+        urls = [
+            reverse('index'),
+            reverse('popular'),
+            reverse('groups'),
+            reverse('group', args=[self.group_target.slug]),
+            reverse('profile', args=[self.user.username]),
+            reverse('post', args=[self.user.username, self.post.id]),
+            reverse('api:posts'),
+        ]
+        for values in ([None, 1], ['не-дата', 1], [{'a': 1}, 1],
+                       ['2020-01-01T00:00:00+00:00', 'x'],
+                       ['2020-01-01T00:00:00+00:00', 1.5]):
+            raw = json.dumps(['n', values]).encode()
+            cursor = base64.urlsafe_b64encode(raw).decode().rstrip('=')
+            for url in urls:
+                with self.subTest(url=url, values=values):
+                    response = self.guest_client.get(url, {'cursor': cursor})
+                    self.assertEqual(response.status_code, 200)
+
+    def test_paginator_does_not_count_posts(self):
+        """Лента не выполняет COUNT-запрос к записям"""
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(reverse('index'))
+        self.assertFalse(
+            any('COUNT(' in query['sql'] for query in queries)
+        )
 
     def test_homepages_cache(self):
         """Кэширование главной страницы выполняется"""
-        self.authorized_client.get(reverse('index'))
-        key = make_template_fragment_key('index_page')
+        response = self.guest_client.get(reverse('index'))
+        key = make_template_fragment_key(
+            'index_page', [
+                response.context['feed_version'],
+                response.context['page'].key, None
+            ]
+        )
         index_page_cache = cache.get(key)
         self.assertIsNotNone(index_page_cache)
 
+    def test_homepage_cache_is_invalidated_on_write(self):
+        """Новый пост сразу появляется на закэшированной главной"""
+        self.guest_client.get(reverse('index'))
+        Post.objects.create(text='Только что', author=self.user)
+        response = self.guest_client.get(reverse('index'))
+        self.assertContains(response, 'Только что')
+
+    def test_homepage_cache_depends_on_page(self):
+        """Разные страницы главной кэшируются отдельно"""
+        Post.objects.bulk_create([
+            Post(text=f'Пост {i}', author=self.user)
+            for i in range(settings.PAGINATE_BY)
+        ])
+        first = self.guest_client.get(reverse('index'))
+        second = self.guest_client.get(
+            reverse('index'), {'cursor': first.context['page'].next_cursor}
+        )
+        self.assertContains(second, self.post.text)
+        self.assertNotContains(first, self.post.text)
+
+    def test_homepage_cache_ignores_cursor_spelling(self):
+        """Ключ кэша страницы зависит от записей, а не от текста курсора"""
+        paginator = CursorPaginator(Post.objects.all(), settings.PAGINATE_BY)
+        made_up = paginator.encode_cursor(
+            {'pub_date': '9999-01-01T00:00:00+00:00', 'id': 0}, 'n'
+        )
+        self.assertEqual(paginator.page(made_up).key, paginator.page().key)
+
+    def test_post_cards_are_cached_by_version(self):
+        """Карточка записи кэшируется и обновляется при изменениях"""
+        url = reverse('group', args=[self.group_target.slug])
+        self.guest_client.get(url)
+        key = card_key(Post.objects.get(pk=self.post.pk))
+        self.assertIn(self.post.text, cache.get(key))
+
+        cache.set(key, cache.get(key).replace(self.post.text, 'Из кэша'))
+        self.assertContains(self.guest_client.get(url), 'Из кэша')
+
+        Comment.objects.create(post=self.post, author=self.user, text='Ком')
+        response = self.guest_client.get(url)
+        self.assertContains(response, self.post.text)
+        self.assertContains(response, 'Комментариев: 1')
+
+    def test_post_card_edit_link_is_shown_to_author_only(self):
+        """Ссылка на редактирование подставляется только автору"""
+        url = reverse('group', args=[self.group_target.slug])
+        edit_url = reverse(
+            'post_edit', args=[self.user.username, self.post.id]
+        )
+        self.assertNotContains(self.not_follow_client.get(url), edit_url)
+        self.assertContains(self.authorized_client.get(url), edit_url)
+        self.assertNotContains(self.guest_client.get(url), edit_url)
+
     def test_user_can_follow(self):
         """Пользователь может подписываться на других"""
         self.follower_client.get(reverse(
@@ -299,3 +471,230 @@ class PostsPagesTests(TestCase):
         """Новый пост не появляется в ленте других пользователей"""
         response = self.not_follow_client.get(reverse('follow_index'))
         self.assertEqual(len(response.context['page']), 0)
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        """Новый пост попадает в материализованную ленту подписчиков"""
+        self.authorized_client.post(
+            reverse('new_post'), data={'text': 'Свежий пост'}
+        )
+        post = Post.objects.get(text='Свежий пост')
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.user_follower, post=post
+        ).exists())
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.user_not_follower, post=post
+        ).exists())
+
+    def test_follow_backfills_and_unfollow_prunes_timeline(self):
+        """Подписка заполняет ленту, отписка очищает её"""
+        self.not_follow_client.get(reverse(
+            'profile_follow', kwargs={'username': self.user.username}
+        ))
+        response = self.not_follow_client.get(reverse('follow_index'))
+        self.assertEqual(list(response.context['page']), [self.post])
+
+        self.not_follow_client.get(reverse(
+            'profile_unfollow', kwargs={'username': self.user.username}
+        ))
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.user_not_follower).exists()
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_celebrity_posts_are_read_with_join(self):
+        """Посты популярных авторов читаются без материализации"""
+        Follow.objects.create(user=self.user_not_follower, author=self.user)
+        post = Post.objects.create(text='Для всех', author=self.user)
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=post).exists()
+        )
+        response = self.follower_client.get(reverse('follow_index'))
+        self.assertEqual(response.context['page'][0], post)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1, TIMELINE_DEMOTE_LIMIT=1,
+                       TIMELINE_BACKFILL_ASYNC=False)
+    def test_celebrity_posts_join_the_timeline(self):
+        """Лента объединяет материализованные посты и посты популярных"""
+        celebrity = User.objects.create_user(username='Ronnie')
+        Follow.objects.create(user=self.user_follower, author=celebrity)
+        Follow.objects.create(user=self.user_not_follower, author=celebrity)
+        post = Post.objects.create(text='Для всех', author=celebrity)
+        response = self.follower_client.get(reverse('follow_index'))
+        self.assertEqual(list(response.context['page']), [post, self.post])
+
+        Follow.objects.filter(
+            user=self.user_not_follower, author=celebrity
+        ).delete()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.user_follower, post=post
+        ).exists())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2, TIMELINE_DEMOTE_LIMIT=1,
+                       TIMELINE_BACKFILL_ASYNC=False)
+    def test_celebrity_is_demoted_below_the_gap(self):
+        """Автор снова рассылается в ленты только ниже нижнего порога"""
+        celebrity = User.objects.create_user(username='Ronnie')
+        earlier = Post.objects.create(text='Раньше', author=celebrity)
+        follows = [
+            Follow.objects.create(user=user, author=celebrity)
+            for user in (self.user_follower, self.user_not_follower,
+                         self.user)
+        ]
+        later = Post.objects.create(text='Позже', author=celebrity)
+        TimelineEntry.objects.filter(post=earlier).delete()
+
+        follows[2].delete()
+        self.assertFalse(TimelineEntry.objects.filter(post=later).exists())
+        Follow.objects.create(user=self.user, author=celebrity)
+        self.assertFalse(TimelineEntry.objects.filter(post=later).exists())
+
+        Follow.objects.filter(author=celebrity, user=self.user).delete()
+        follows[1].delete()
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('user', 'post').filter(
+                post__author=celebrity
+            )),
+            [(self.user_follower.pk, later.pk)]
+        )
+
+    def test_search_finds_posts_by_words(self):
+        """Поиск находит записи по словам текста"""
+        match = Post.objects.create(
+            text='Кошки любят молоко', author=self.user
+        )
+        Post.objects.create(text='Собаки любят кости', author=self.user)
+        response = self.guest_client.get(reverse('search'), {'q': 'молоко'})
+        self.assertEqual(list(response.context['page']), [match])
+
+    def test_search_index_follows_edits(self):
+        """Поисковый индекс обновляется при редактировании записи"""
+        self.authorized_client.post(
+            reverse('post_edit', kwargs={
+                'username': self.user.username, 'post_id': self.post.id
+            }),
+            data={'text': 'Совершенно новый текст'}
+        )
+        response = self.guest_client.get(reverse('search'), {'q': 'новый'})
+        self.assertEqual(len(response.context['page']), 1)
+        response = self.guest_client.get(
+            reverse('search'), {'q': 'Тестовый'}
+        )
+        self.assertEqual(len(response.context['page']), 0)
+
+    def test_cursor_keeps_decimal_ranks(self):
+        """Курсор передаёт числовой ранг поиска без потери точности"""
+        paginator = CursorPaginator(Post.objects.annotate(rank=Cast(
+            Value(0), DecimalField(max_digits=15, decimal_places=9)
+        )), 1, SEARCH_ORDERING)
+        rank = Decimal('0.060792711')
+        cursor = paginator.encode_cursor({'rank': rank, 'id': 1}, 'n')
+        _, (value, _) = paginator.decode_cursor(cursor)
+        self.assertEqual(value, rank)
+
+    def test_search_survives_fts_syntax(self):
+        """Спецсимволы в запросе не ломают поиск"""
+        response = self.guest_client.get(
+            reverse('search'), {'q': 'текст" OR NEAR('}
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_admin_search_uses_search_index(self):
+        """Поиск в админке идёт через полнотекстовый индекс"""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        client = Client()
+        client.force_login(admin)
+        Post.objects.create(text='Кошки любят молоко', author=self.user)
+        response = client.get('/admin/posts/post/', {'q': 'молоко'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+    def test_conditional_get_returns_not_modified(self):
+        """Неизменившиеся страницы отдаются с кодом 304"""
+        urls = [
+            reverse('index'),
+            reverse('group', kwargs={'slug': self.group_target.slug}),
+            reverse('profile', kwargs={'username': self.user.username}),
+            reverse('post', kwargs={
+                'username': self.user.username, 'post_id': self.post.id
+            }),
+            reverse('follow_index'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.follower_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                response = self.follower_client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes_with_content_and_viewer(self):
+        """ETag зависит от данных и от пользователя"""
+        url = reverse('profile', kwargs={'username': self.user.username})
+        etag = self.follower_client.get(url)['ETag']
+        self.assertNotEqual(self.not_follow_client.get(url)['ETag'], etag)
+
+        self.follower_client.get(reverse(
+            'profile_unfollow', kwargs={'username': self.user.username}
+        ))
+        response = self.follower_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response['ETag']
+        Comment.objects.create(
+            post=self.post, author=self.user_follower, text='Комментарий'
+        )
+        response = self.follower_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_anonymous_feed_has_last_modified(self):
+        """Главная для гостя отдаёт Last-Modified"""
+        response = self.guest_client.get(reverse('index'))
+        response = self.guest_client.get(
+            reverse('index'),
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, 304)
+
+
+class FollowingCacheTests(TransactionTestCase):
+    """Кэш подписок сбрасывается после фиксации транзакции"""
+
+    def setUp(self):
+        caches[settings.FOLLOWING_CACHE].clear()
+        self.author = User.objects.create_user(username='Ozzy')
+        self.reader = User.objects.create_user(username='Tony')
+        self.client.force_login(self.reader)
+
+    def test_following_is_checked_without_queries(self):
+        """Подписки берутся из кэша и обновляются при (от)подписке"""
+        self.assertFalse(is_following(self.reader, self.author.id))
+        with self.assertNumQueries(0):
+            self.assertFalse(is_following(self.reader, self.author.id))
+
+        self.client.get(reverse('profile_follow', args=['Ozzy']))
+        self.assertTrue(is_following(self.reader, self.author.id))
+        with self.assertNumQueries(0):
+            self.assertTrue(is_following(self.reader, self.author.id))
+
+        self.client.get(reverse('profile_unfollow', args=['Ozzy']))
+        self.assertFalse(is_following(self.reader, self.author.id))
+        self.assertFalse(is_following(AnonymousUser(), self.author.id))
+
+    def test_rolled_back_follow_is_not_cached(self):
+        """Отменённая подписка не остаётся в кэше"""
+        self.assertFalse(is_following(self.reader, self.author.id))
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=self.reader, author=self.author)
+            raise IntegrityError
+        self.assertFalse(is_following(self.reader, self.author.id))
+
+    def test_load_racing_the_commit_is_not_read(self):
+        """Набор, прочитанный до фиксации подписки, не попадает в чтения"""
+        key = following._key(self.reader.id)
+        with transaction.atomic():
+            Follow.objects.create(user=self.reader, author=self.author)
+        # A load that queried the rows before the commit stores them late.
+        caches[settings.FOLLOWING_CACHE].set(key, array('q'))
+        self.assertTrue(is_following(self.reader, self.author.id))
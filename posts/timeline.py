@@ -0,0 +1,228 @@
+"""Materialized follow timelines (fan-out on write).
+
+Every follower of an author gets a ``TimelineEntry`` row when the author
+publishes, so ``follow_index`` reads a single index range. An author who
+passes ``TIMELINE_FANOUT_LIMIT`` followers becomes a celebrity: from
+``Profile.celebrity_since`` on their posts are not fanned out, and the
+feed of their followers adds them to the timeline ones. Timelines keep
+holding the earlier posts, new followers get only those. Once the author
+drops to ``TIMELINE_DEMOTE_LIMIT`` the posts written since are fanned out
+by a background job after the commit; the gap between the two limits
+keeps a follow and an unfollow at the edge from switching back and forth.
+"""
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .models import Follow, Post, Profile, TimelineEntry
+
+logger = logging.getLogger(__name__)
+
+FEED_ORDERING = ('-feed_date', '-feed_id')
+BATCH_SIZE = 500
+# Celebrities marked by bulk writes: none of their posts was fanned out.
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='timeline'
+        )
+    return _executor
+
+
+def celebrity_since(author_id):
+    """Since when posts of the author are not fanned out, or None"""
+    return Profile.objects.filter(user_id=author_id).values_list(
+        'celebrity_since', flat=True
+    ).first()
+
+
+def celebrity_ids(user):
+    """Ids of authors followed by ``user`` that are not fanned out"""
+    return Follow.objects.filter(
+        user=user, author__profile__celebrity_since__isnull=False
+    ).values_list('author_id', flat=True)
+
+
+def promoted(author_id):
+    """Stop fanning out the author once they pass the limit"""
+    Profile.objects.filter(
+        user_id=author_id, celebrity_since__isnull=True,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).update(celebrity_since=timezone.now())
+
+
+def fan_out(post):
+    """Push a new post into the timelines of its author's followers"""
+    if celebrity_since(post.author_id) is not None:
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in follower_ids],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def _insert(entries):
+    """Bulk insert timeline entries from an iterable, one batch at a time"""
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def _celebrities(author_ids):
+    """``celebrity_since`` of the celebrities among ``author_ids``.
+
+    Bulk writes skip the signals and the profile counters are stale, so
+    authors over the limit by their ``Follow`` rows are marked here.
+    """
+    over_limit = Follow.objects.filter(
+        author_id__in=author_ids
+    ).values('author_id').annotate(total=Count('pk')).filter(
+        total__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).values('author_id')
+    Profile.objects.filter(
+        user_id__in=over_limit, celebrity_since__isnull=True
+    ).update(celebrity_since=EPOCH)
+    return dict(Profile.objects.filter(
+        user_id__in=author_ids, celebrity_since__isnull=False
+    ).values_list('user_id', 'celebrity_since'))
+
+
+def _fanned_out(author_id, pub_date, celebrities):
+    since = celebrities.get(author_id)
+    return since is None or pub_date < since
+
+
+def fan_out_many(posts):
+    """Fan out a batch of posts written without signals (bulk imports)"""
+    by_author = defaultdict(list)
+    for post in posts:
+        by_author[post.author_id].append(post)
+    celebrities = _celebrities(list(by_author))
+    follows = Follow.objects.filter(
+        author_id__in=list(by_author)
+    ).values_list('user_id', 'author_id')
+    _insert(
+        TimelineEntry(user_id=user_id, post_id=post.id,
+                      pub_date=post.pub_date)
+        for user_id, author_id in follows
+        for post in by_author[author_id]
+        if _fanned_out(author_id, post.pub_date, celebrities)
+    )
+
+
+def backfill_many(pairs):
+    """Backfill ``(user_id, author_id)`` follows written without signals"""
+    followers = defaultdict(list)
+    for user_id, author_id in pairs:
+        followers[author_id].append(user_id)
+    celebrities = _celebrities(list(followers))
+    posts = Post.objects.filter(
+        author_id__in=list(followers)
+    ).values_list('id', 'author_id', 'pub_date')
+    _insert(
+        TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, author_id, pub_date in posts.iterator()
+        if _fanned_out(author_id, pub_date, celebrities)
+        for user_id in followers[author_id]
+    )
+
+
+def backfill(user, author):
+    """Copy the fanned out posts of a newly followed author"""
+    posts = Post.objects.filter(author=author)
+    since = celebrity_since(author.pk)
+    if since is not None:
+        # The later ones are added to the feed of every follower.
+        posts = posts.filter(pub_date__lt=since)
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user=user, post_id=post_id, pub_date=pub_date)
+         for post_id, pub_date in posts.values_list('id', 'pub_date')],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def demote(author_id):
+    """Fan out the posts a former celebrity wrote while not fanned out"""
+    since = Profile.objects.filter(
+        user_id=author_id,
+        followers_count__lte=settings.TIMELINE_DEMOTE_LIMIT
+    ).values_list('celebrity_since', flat=True).first()
+    # Clearing the mark first keeps a second job from doing it again;
+    # until the posts are in, the feeds miss them for a moment.
+    if since is None or not Profile.objects.filter(
+            user_id=author_id, celebrity_since=since
+    ).update(celebrity_since=None):
+        return
+    follower_ids = list(Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True))
+    posts = Post.objects.filter(
+        author_id=author_id, pub_date__gte=since
+    ).values_list('id', 'pub_date')
+    _insert(
+        TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts.iterator()
+        for user_id in follower_ids
+    )
+
+
+def _run(author_id):
+    try:
+        demote(author_id)
+    except Exception:
+        logger.exception('Cannot fan out posts of author %s', author_id)
+    finally:
+        close_old_connections()
+
+
+def demoted(author_id):
+    """Queue ``demote`` once a celebrity drops to the demote limit"""
+    if not Profile.objects.filter(
+            user_id=author_id, celebrity_since__isnull=False,
+            followers_count__lte=settings.TIMELINE_DEMOTE_LIMIT).exists():
+        return
+    if not settings.TIMELINE_BACKFILL_ASYNC:
+        demote(author_id)
+        return
+    transaction.on_commit(lambda: _get_executor().submit(_run, author_id))
+
+
+def prune(user, author):
+    """Drop the posts of an unfollowed author from the timeline"""
+    TimelineEntry.objects.filter(user=user, post__author=author).delete()
+
+
+def feed(user):
+    """Posts of the authors ``user`` follows, ordered by FEED_ORDERING"""
+    celebrities = celebrity_ids(user)
+    if celebrities.exists():
+        return Post.objects.filter(
+            Q(id__in=TimelineEntry.objects.filter(user=user).values('post'))
+            | Q(author_id__in=celebrities)
+        ).annotate(feed_date=F('pub_date'), feed_id=F('id'))
+    return Post.objects.filter(timeline_entries__user=user).annotate(
+        feed_date=F('timeline_entries__pub_date'),
+        feed_id=F('timeline_entries__post'),
+    )
@@ -0,0 +1,87 @@
+"""Precomputed ranking of the popular feed.
+
+``update`` is run periodically (``manage.py update_trending``) and keeps
+a ``TrendingPost`` row for every post published within
+``TRENDING_WINDOW_DAYS``. Each row carries the post's comment heat: every
+comment adds one, and the heat halves every ``TRENDING_HALF_LIFE_HOURS``.
+A run reads the posts of the window with their stored comment counters
+in one index range, folds the comments added since the previous run
+into the heat and rescores the rows batch by batch::
+
+    score = (1 + heat) / (age in hours + 2) ** TRENDING_GRAVITY
+
+so the comment rate pushes a post up and its age pulls it down. Comments
+themselves are never scanned. The feed reads the ranked table with one
+indexed query.
+"""
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import bump_trending_version
+from .models import Post, TrendingPost
+
+FEED_ORDERING = ('-score', '-post_id')
+BATCH_SIZE = 500
+
+
+def feed():
+    """Rows of the popular feed with their posts, see ``FEED_ORDERING``"""
+    return TrendingPost.objects.select_related('post__author', 'post__group')
+
+
+def score_batch(rows, counts, now):
+    """Fold new comments into the heat of the rows and score them"""
+    decay = math.log(2) / (settings.TRENDING_HALF_LIFE_HOURS * 3600)
+    gravity = settings.TRENDING_GRAVITY
+    for row, count in zip(rows, counts):
+        elapsed = max((now - row.heat_updated).total_seconds(), 0)
+        row.heat = row.heat * math.exp(-decay * elapsed) + max(
+            count - row.comments_count, 0
+        )
+        row.heat_updated = now
+        row.comments_count = count
+        age = max((now - row.pub_date).total_seconds(), 0) / 3600
+        row.score = (1 + row.heat) / (age + 2) ** gravity
+
+
+def update(now=None):
+    """Rescore the posts of the window, return numbers for the report"""
+    now = now or timezone.now()
+    since = now - timedelta(days=settings.TRENDING_WINDOW_DAYS)
+    stored = {
+        row.post_id: row
+        for row in TrendingPost.objects.filter(pub_date__gte=since)
+    }
+    rows, counts, created = [], [], []
+    posts = Post.objects.filter(pub_date__gte=since).order_by().values_list(
+        'id', 'pub_date', 'comments_count'
+    )
+    for post_id, pub_date, comments_count in posts.iterator():
+        row = stored.get(post_id)
+        if row is None:
+            row = TrendingPost(
+                post_id=post_id, pub_date=pub_date, heat_updated=pub_date
+            )
+            created.append(row)
+        rows.append(row)
+        counts.append(comments_count)
+    with transaction.atomic():
+        removed, _ = TrendingPost.objects.filter(pub_date__lt=since).delete()
+        for start in range(0, len(rows), BATCH_SIZE):
+            score_batch(
+                rows[start:start + BATCH_SIZE],
+                counts[start:start + BATCH_SIZE],
+                now
+            )
+        TrendingPost.objects.bulk_create(created, batch_size=BATCH_SIZE)
+        TrendingPost.objects.bulk_update(
+            [row for row in rows if row.post_id in stored],
+            ['comments_count', 'heat', 'heat_updated', 'score'],
+            batch_size=BATCH_SIZE
+        )
+    bump_trending_version()
+    return {'scored': len(rows), 'created': len(created), 'removed': removed}
@@ -1,32 +1,144 @@
+from urllib.parse import urlencode
+
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils import timezone
+from django.views.decorators.http import condition
 
-from .forms import CommentForm, PostForm, GroupForm
-from .models import Follow, Group, Post, User
-
+from yatube.query_budget import query_budget
+from yatube.ratelimit import ratelimit
 
+from .forms import CommentForm, PostForm, GroupForm
+from .models import Comment, Follow, Group, Post, User
+from . import (
+    directory, following, renditions, search, timeline, trending
+)
+from .cache import cache_timeout, feed_version, trending_version
+from .conditional import (
+    author_etag, feed_etag, feed_last_modified, groups_etag, trending_etag
+)
+from .paginator import CursorPaginator
+
+COMMENT_ORDERINGS = {
+    'oldest': ('created', 'id'),
+    'newest': ('-created', '-id'),
+}
+
+
+@query_budget(3)
+@condition(etag_func=feed_etag, last_modified_func=feed_last_modified)
 def index(request):
     """Show last posts on the homepage"""
-    post_list = Post.objects.select_related('group').all()
-    paginator = Paginator(post_list, settings.PAGINATE_BY)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(request, 'index.html', {'page': page})
+    post_list = Post.objects.select_related('author', 'group')
+    paginator = CursorPaginator(post_list, settings.PAGINATE_BY)
+    page = paginator.get_page(request.GET.get('cursor'))
+    version = feed_version()
+    return render(
+        request,
+        'index.html',
+        {'page': page,
+         'feed_version': version,
+         'feed_editor': _feed_editor(request, page),
+         'cache_timeout': cache_timeout(settings.FEED_CACHE_TIMEOUT, version),
+         }
+    )
 
 
+@query_budget(3)
+@condition(etag_func=trending_etag)
+def popular(request):
+    """Show recent posts ranked by their comments"""
+    paginator = CursorPaginator(
+        trending.feed(), settings.PAGINATE_BY, trending.FEED_ORDERING
+    )
+    page = paginator.get_page(request.GET.get('cursor'))
+    # The ranking is walked in index order, the page shows its posts.
+    posts = [row.post for row in page]
+    versions = feed_version(), trending_version()
+    return render(
+        request,
+        'popular.html',
+        {'page': page,
+         'posts': posts,
+         'feed_version': versions[0],
+         'trending_version': versions[1],
+         'feed_editor': _feed_editor(request, posts),
+         'cache_timeout': cache_timeout(
+             settings.FEED_CACHE_TIMEOUT, *versions
+         ),
+         }
+    )
+
+
+def _feed_editor(request, posts):
+    """Viewer id if there are their posts, for the fragment cache key"""
+    # Edit links are only rendered for the author, so authors of posts on
+    # the page get their own copy of the fragment.
+    if any(post.author_id == request.user.pk for post in posts):
+        return request.user.pk
+    return None
+
+
+@query_budget(3)
+def search_posts(request):
+    """Show posts matching the search query"""
+    query = request.GET.get('q', '').strip()
+    page = None
+    if query:
+        post_list = search.search_posts(
+            query, Post.objects.select_related('author', 'group')
+        )
+        paginator = CursorPaginator(
+            post_list, settings.PAGINATE_BY, search.SEARCH_ORDERING
+        )
+        page = paginator.get_page(request.GET.get('cursor'))
+    return render(
+        request,
+        'search.html',
+        {'query': query,
+         'page': page,
+         'page_query': urlencode({'q': query}),
+         }
+    )
+
+
+@query_budget(4)
+@condition(etag_func=feed_etag, last_modified_func=feed_last_modified)
 def group_posts(request, slug):
     """Show posts on the group's page"""
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    paginator = Paginator(post_list, settings.PAGINATE_BY)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post_list = group.posts.select_related('author', 'group')
+    paginator = CursorPaginator(post_list, settings.PAGINATE_BY)
+    page = paginator.get_page(request.GET.get('cursor'))
     return render(request, 'group.html', {'group': group, 'page': page})
 
 
+@query_budget(3)
+@condition(etag_func=groups_etag)
+def group_list(request):
+    """Show all groups with their activity"""
+    paginator = CursorPaginator(
+        directory.groups(), settings.GROUPS_PAGINATE_BY, directory.ORDERING
+    )
+    page = paginator.get_page(request.GET.get('cursor'))
+    version = feed_version()
+    return render(
+        request,
+        'group_list.html',
+        {'page': page,
+         'recent_days': directory.RECENT_DAYS,
+         'feed_version': version,
+         'today': timezone.localdate(),
+         'cache_timeout': cache_timeout(settings.FEED_CACHE_TIMEOUT, version),
+         }
+    )
+
+
+@query_budget(11)
 @login_required
+@ratelimit('new_post')
 def new_post(request):
     """Create new post"""
     form = PostForm(request.POST or None, files=request.FILES or None,)
@@ -34,28 +146,26 @@ def new_post(request):
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        with transaction.atomic():
+            post.save()
+            if post.image:
+                renditions.schedule(post)
         return redirect('index')
 
     return render(request, 'new_post.html', {'form': form})
 
 
+@query_budget(6)
+@condition(etag_func=author_etag)
 def profile(request, username):
     """Show user's profile"""
-    user = get_object_or_404(User, username=username)
-    post_list = user.posts.all()
-    paginator = Paginator(post_list, settings.PAGINATE_BY)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-
-    count = user.posts.count()
-    followers = Follow.objects.filter(author=user).count()
-    followings = Follow.objects.filter(user=user).count()
-
-    following = False
-    if request.user.is_authenticated:
-        if Follow.objects.filter(user=request.user, author=user).exists():
-            following = True
+    user = get_object_or_404(
+        User.objects.select_related('profile'),
+        username=username
+    )
+    post_list = user.posts.select_related('group')
+    paginator = CursorPaginator(post_list, settings.PAGINATE_BY)
+    page = paginator.get_page(request.GET.get('cursor'))
 
     return render(
         request,
@@ -63,49 +173,78 @@ def profile(request, username):
         {'author': user,
          'page': page,
          'paginator': paginator,
-         'count': count,
-         'followers': followers,
-         'followings': followings,
-         'following': following,
+         'count': user.profile.posts_count,
+         'followers': user.profile.followers_count,
+         'followings': user.profile.followings_count,
+         'following': following.is_following(request.user, user.id),
          }
     )
 
 
+@query_budget(6)
+@condition(etag_func=author_etag)
 def post_view(request, username, post_id):
     """Show post"""
     post = get_object_or_404(
-        Post.objects.select_related('author'),
+        Post.objects.select_related('author__profile', 'group'),
         id=post_id,
         author__username=username
     )
     user = post.author
-    count = user.posts.count()
-    comments = post.comments.all()
-    followers = Follow.objects.filter(author=user).count()
-    followings = Follow.objects.filter(user=user).count()
+    order, comments = _comment_page(request, post.id)
 
     form = CommentForm()
 
-    following = False
-    if request.user.is_authenticated:
-        if Follow.objects.filter(user=request.user, author=user).exists():
-            following = True
-
     return render(
         request,
         'post.html',
         {'post': post,
          'author': user,
-         'count': count,
+         'count': user.profile.posts_count,
          'comments': comments,
+         'order': order,
+         'username': username,
+         'post_id': post.id,
          'form': form,
-         'followers': followers,
-         'followings': followings,
-         'following': following,
+         'followers': user.profile.followers_count,
+         'followings': user.profile.followings_count,
+         'following': following.is_following(request.user, user.id),
          }
     )
 
 
+@query_budget(4)
+@condition(etag_func=feed_etag)
+def post_comments(request, username, post_id):
+    """Render a page of post's comments for the "load more" button"""
+    post = get_object_or_404(
+        Post.objects.only('id'), id=post_id, author__username=username
+    )
+    order, comments = _comment_page(request, post.id)
+    return render(
+        request,
+        'includes/comment_list.html',
+        {'comments': comments,
+         'order': order,
+         'username': username,
+         'post_id': post.id,
+         }
+    )
+
+
+def _comment_page(request, post_id):
+    """Requested order and page of post's comments with their authors"""
+    order = request.GET.get('order')
+    if order not in COMMENT_ORDERINGS:
+        order = 'oldest'
+    comments = Comment.objects.filter(post_id=post_id).select_related('author')
+    paginator = CursorPaginator(
+        comments, settings.COMMENTS_PAGINATE_BY, COMMENT_ORDERINGS[order]
+    )
+    return order, paginator.get_page(request.GET.get('cursor'))
+
+
+@query_budget(5)
 @login_required
 def post_edit(request, username, post_id):
     """Edit existing post"""
@@ -118,12 +257,24 @@ def post_edit(request, username, post_id):
         instance=post
     )
     if form.is_valid():
-        post.save()
+        # Comments and the rendition workers update the other columns
+        # while the form is filled in, only the edited ones are saved.
+        fields = ['text', 'group', 'image', 'version']
+        image_changed = 'image' in form.changed_data
+        if image_changed:
+            post.renditions = ''
+            fields.append('renditions')
+        with transaction.atomic():
+            post.save(update_fields=fields)
+            if image_changed and post.image:
+                renditions.schedule(post)
         return redirect('post', post_id=post.id, username=username)
     return render(request, 'new_post.html', {'form': form, 'post': post})
 
 
+@query_budget(7)
 @login_required
+@ratelimit('add_comment')
 def add_comment(request, username, post_id):
     """Add comment"""
     post = get_object_or_404(
@@ -137,41 +288,53 @@ def add_comment(request, username, post_id):
         comment = form.save(commit=False)
         comment.author = author
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
 
     return redirect('post', post_id=post.id, username=username)
 
 
+@query_budget(4)
 @login_required
+@condition(etag_func=feed_etag)
 def follow_index(request):
     """Show my subscription's"""
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, settings.PAGINATE_BY)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post_list = timeline.feed(request.user).select_related('author', 'group')
+    paginator = CursorPaginator(
+        post_list, settings.PAGINATE_BY, timeline.FEED_ORDERING
+    )
+    page = paginator.get_page(request.GET.get('cursor'))
     return render(request, 'follow.html', {'page': page})
 
 
+@query_budget(14)
 @login_required
+@ratelimit('follow', methods=None)
 def profile_follow(request, username):
     """Follow user"""
     user = request.user
     author = get_object_or_404(User, username=username)
     if user != author:
-        Follow.objects.get_or_create(user=user, author=author)
+        with transaction.atomic():
+            Follow.objects.get_or_create(user=user, author=author)
     return redirect('profile', username=username)
 
 
+@query_budget(11)
 @login_required
+@ratelimit('follow', methods=None)
 def profile_unfollow(request, username):
     """Unfollow user"""
     user = request.user
     author = get_object_or_404(User, username=username)
-    Follow.objects.filter(user=user, author=author).delete()
+    with transaction.atomic():
+        Follow.objects.filter(user=user, author=author).delete()
     return redirect('profile', username=username)
 
 
+@query_budget(4)
 @login_required
+@ratelimit('group_create')
 def group_create(request):
     """Create new group"""
     form = GroupForm(request.POST or None)
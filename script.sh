@@ -2,4 +2,4 @@
 echo "Hello, dear employer!"
 python manage.py migrate
 python manage.py collectstatic --noinput
-gunicorn yatube.wsgi:application --bind 0.0.0.0:8000
+gunicorn yatube.wsgi:application --config gunicorn.conf.py
@@ -1,10 +1,37 @@
+from django import forms
 from django.contrib.auth import get_user_model
 from django.contrib.auth.forms import UserCreationForm
+from django.urls import URLResolver, get_resolver
 
 User = get_user_model()
 
 
+def reserved_usernames():
+    """First path segments of fixed routes, they would hide the profile"""
+    names = set()
+    patterns = list(get_resolver().url_patterns)
+    while patterns:
+        pattern = patterns.pop()
+        route = str(pattern.pattern)
+        if not route and isinstance(pattern, URLResolver):
+            # An include at the root, like posts.urls.
+            patterns += pattern.url_patterns
+            continue
+        segment = route.lstrip('^').split('/')[0]
+        if segment and '<' not in segment and '(' not in segment:
+            names.add(segment)
+    return names
+
+
 class CreationForm(UserCreationForm):
     class Meta(UserCreationForm.Meta):
         model = User
         fields = ('first_name', 'last_name', 'username', 'email')
+
+    def clean_username(self):
+        username = self.cleaned_data['username']
+        if username in reserved_usernames():
+            raise forms.ValidationError(
+                'Это имя занято адресом на сайте', code='reserved_username'
+            )
+        return username
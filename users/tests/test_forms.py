@@ -0,0 +1,29 @@
+from django.test import TestCase
+
+from ..forms import CreationForm
+
+
+class CreationFormTests(TestCase):
+    def test_route_names_are_reserved(self):
+        """Нельзя занять имя, совпадающее с адресом страницы сайта"""
+        for username in ('search', 'popular', 'groups'):
+            with self.subTest(username=username):
+                form = CreationForm(data={
+                    'username': username,
+                    'password1': 'Gf8s!kLq2zX',
+                    'password2': 'Gf8s!kLq2zX',
+                })
+                self.assertFalse(form.is_valid())
+                self.assertEqual(
+                    form.errors.as_data()['username'][0].code,
+                    'reserved_username'
+                )
+
+    def test_other_names_are_accepted(self):
+        """Обычное имя пользователя принимается"""
+        form = CreationForm(data={
+            'username': 'searcher',
+            'password1': 'Gf8s!kLq2zX',
+            'password2': 'Gf8s!kLq2zX',
+        })
+        self.assertTrue(form.is_valid(), form.errors)
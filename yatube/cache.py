@@ -0,0 +1,192 @@
+"""Two-tier cache: a bounded in-process LRU in front of a shared cache.
+
+Every gunicorn worker keeps its own small LRU so hot keys are served
+without a network round trip, while the shared backend (memcached in
+production, ``LocMemCache`` in tests) is the source of truth. Local
+copies live at most ``LOCAL_TIMEOUT`` seconds. Version stamps (keys with
+one of the ``SHARED_ONLY_PREFIXES``) always go to the shared backend, so
+an invalidation in one worker is seen by all others on the next read
+and content cached under versioned keys never goes stale.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'yatube.cache.TwoTierCache',
+            'OPTIONS': {
+                'SHARED': 'shared',
+                'LOCAL_MAX_ENTRIES': 1000,
+                'LOCAL_TIMEOUT': 5,
+            },
+        },
+        'shared': {...},
+    }
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from .metrics import REGISTRY
+
+_MISSING = object()
+
+
+def _record(tier, hits, misses):
+    if hits:
+        REGISTRY.inc(
+            'yatube_cache_requests_total', hits, tier=tier, result='hit'
+        )
+    if misses:
+        REGISTRY.inc(
+            'yatube_cache_requests_total', misses, tier=tier, result='miss'
+        )
+
+
+class TwoTierCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED', 'shared')
+        self._local_max_entries = int(options.get('LOCAL_MAX_ENTRIES', 1000))
+        self._local_timeout = float(options.get('LOCAL_TIMEOUT', 5))
+        self._shared_only = tuple(
+            options.get('SHARED_ONLY_PREFIXES', ('version:',))
+        )
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def _is_local(self, key):
+        return not key.startswith(self._shared_only)
+
+    def _local_get(self, key, version):
+        local_key = self.make_key(key, version)
+        with self._lock:
+            entry = self._local.get(local_key)
+            if entry is None:
+                return _MISSING
+            expires, pickled = entry
+            if expires <= time.monotonic():
+                del self._local[local_key]
+                return _MISSING
+            self._local.move_to_end(local_key)
+        return pickle.loads(pickled)
+
+    def _local_set(self, key, value, timeout, version):
+        if not self._is_local(key):
+            return
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        ttl = self._local_timeout
+        if timeout is not None:
+            ttl = min(ttl, timeout)
+        if ttl <= 0:
+            self._local_delete(key, version)
+            return
+        local_key = self.make_key(key, version)
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._local[local_key] = (time.monotonic() + ttl, pickled)
+            self._local.move_to_end(local_key)
+            while len(self._local) > self._local_max_entries:
+                self._local.popitem(last=False)
+
+    def _local_delete(self, key, version):
+        with self._lock:
+            self._local.pop(self.make_key(key, version), None)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version)
+        if added:
+            self._local_set(key, value, timeout, version)
+        else:
+            self._local_delete(key, version)
+        return added
+
+    def get(self, key, default=None, version=None):
+        if self._is_local(key):
+            value = self._local_get(key, version)
+            if value is not _MISSING:
+                _record('local', 1, 0)
+                return value
+            _record('local', 0, 1)
+        value = self.shared.get(key, _MISSING, version)
+        if value is _MISSING:
+            _record('shared', 0, 1)
+            return default
+        _record('shared', 1, 0)
+        self._local_set(key, value, DEFAULT_TIMEOUT, version)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version)
+        self._local_set(key, value, timeout, version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._local_delete(key, version)
+        return self.shared.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        self._local_delete(key, version)
+        self.shared.delete(key, version)
+
+    def get_many(self, keys, version=None):
+        found = {}
+        remote = []
+        local_misses = 0
+        for key in keys:
+            value = _MISSING
+            if self._is_local(key):
+                value = self._local_get(key, version)
+                local_misses += value is _MISSING
+            if value is _MISSING:
+                remote.append(key)
+            else:
+                found[key] = value
+        _record('local', len(found), local_misses)
+        if remote:
+            fetched = self.shared.get_many(remote, version)
+            _record('shared', len(fetched), len(remote) - len(fetched))
+            for key, value in fetched.items():
+                self._local_set(key, value, DEFAULT_TIMEOUT, version)
+            found.update(fetched)
+        return found
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version)
+        for key, value in data.items():
+            if key not in failed:
+                self._local_set(key, value, timeout, version)
+        return failed
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self._local_delete(key, version)
+        self.shared.delete_many(keys, version)
+
+    def has_key(self, key, version=None):
+        if self._is_local(key):
+            if self._local_get(key, version) is not _MISSING:
+                return True
+        return self.shared.has_key(key, version)
+
+    def incr(self, key, delta=1, version=None):
+        self._local_delete(key, version)
+        return self.shared.incr(key, delta, version)
+
+    def decr(self, key, delta=1, version=None):
+        self._local_delete(key, version)
+        return self.shared.decr(key, delta, version)
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+        self.shared.clear()
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
@@ -0,0 +1,324 @@
+"""Request, SQL, template, cache and thumbnail metrics for Prometheus.
+
+Every worker process collects its numbers in ``REGISTRY``:
+
+* ``MetricsMiddleware`` times requests and their SQL per URL name,
+* the ``DjangoTemplates`` backend below times template rendering,
+* ``yatube.cache.TwoTierCache`` counts hits and misses per tier,
+* ``posts.renditions`` times thumbnail generation.
+
+With ``METRICS_DIR`` set the registry is written to ``<pid>.json`` in
+that directory at most every ``METRICS_FLUSH_INTERVAL`` seconds, and the
+``/metrics`` view sums the files of all gunicorn workers (the master
+folds files of exited workers into ``archive.json``, see
+``gunicorn.conf.py``). The archive lists the processes folded into it,
+so a scrape that still finds the file of one of them skips it instead
+of counting the worker twice. Without it only the serving process is
+reported.
+The view answers 404 unless ``METRICS_TOKEN`` is set and sent as
+``Authorization: Bearer <token>``.
+"""
+import atexit
+import glob
+import hmac
+import json
+import os
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import Http404, HttpResponse
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+ARCHIVE = 'archive.json'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# name: (type, help)
+METRICS = {
+    'yatube_requests_total': (
+        'counter', 'Requests by URL name, method and status'),
+    'yatube_request_duration_seconds': (
+        'histogram', 'Request latency by URL name'),
+    'yatube_sql_queries_total': (
+        'counter', 'SQL statements run by requests'),
+    'yatube_sql_duration_seconds_total': (
+        'counter', 'Time spent in SQL statements by requests'),
+    'yatube_template_render_seconds': (
+        'histogram', 'Template rendering time by URL name and template'),
+    'yatube_cache_requests_total': (
+        'counter', 'Cache lookups by tier and result'),
+    'yatube_rendition_seconds': (
+        'histogram', 'Thumbnail generation time by rendition'),
+}
+
+
+class Registry:
+    """Counters and histograms of one process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            # Bucket counts are not cumulative here, ``render`` adds them up.
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [0] * (len(BUCKETS) + 3)
+            index = 0
+            while index < len(BUCKETS) and value > BUCKETS[index]:
+                index += 1
+            histogram[index] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': [
+                    [name, dict(labels), value]
+                    for (name, labels), value in self.counters.items()
+                ],
+                'histograms': [
+                    [name, dict(labels), list(values)]
+                    for (name, labels), values in self.histograms.items()
+                ],
+            }
+
+    def merge(self, snapshot):
+        for name, labels, value in snapshot['counters']:
+            self.inc(name, value, **labels)
+        for name, labels, values in snapshot['histograms']:
+            key = self._key(name, labels)
+            with self._lock:
+                histogram = self.histograms.setdefault(
+                    key, [0] * len(values)
+                )
+                for index, value in enumerate(values):
+                    histogram[index] += value
+
+
+REGISTRY = Registry()
+_last_flush = 0
+_flush_at_exit = False
+_process = None
+# Processes remembered in the archive, their files are gone long before.
+FOLDED_KEPT = 100
+
+
+def process_id():
+    """Identifies this process even after its pid is reused"""
+    global _process
+    if _process is None or not _process.startswith('%s-' % os.getpid()):
+        _process = '%s-%s' % (os.getpid(), time.time())
+    return _process
+
+
+def _read(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _write(path, snapshot):
+    temporary = '%s.%s.tmp' % (path, threading.get_ident())
+    with open(temporary, 'w') as file:
+        json.dump(snapshot, file)
+    os.replace(temporary, path)
+
+
+def flush(force=False):
+    """Write this process's registry to ``METRICS_DIR``"""
+    global _last_flush
+    directory = settings.METRICS_DIR
+    now = time.monotonic()
+    if not directory or (
+            not force and now - _last_flush < settings.METRICS_FLUSH_INTERVAL):
+        return
+    _last_flush = now
+    os.makedirs(directory, exist_ok=True)
+    _write(os.path.join(directory, '%s.json' % os.getpid()),
+           dict(REGISTRY.snapshot(), process=process_id()))
+
+
+def archive(directory, pid):
+    """Fold the file of an exited worker into the archive"""
+    path = os.path.join(directory, '%s.json' % pid)
+    snapshot = _read(path)
+    if snapshot is None:
+        return
+    archived = _read(os.path.join(directory, ARCHIVE)) or {}
+    registry = Registry()
+    for source in (archived, snapshot):
+        if source:
+            registry.merge(source)
+    folded = archived.get('folded', []) + [snapshot.get('process')]
+    _write(os.path.join(directory, ARCHIVE), dict(
+        registry.snapshot(), folded=folded[-FOLDED_KEPT:]
+    ))
+    os.remove(path)
+
+
+def collect():
+    """Registry with the numbers of every worker"""
+    directory = settings.METRICS_DIR
+    if not directory:
+        return REGISTRY
+    skipped = {
+        os.path.join(directory, ARCHIVE),
+        os.path.join(directory, '%s.json' % os.getpid()),
+    }
+    snapshots = [
+        _read(path) for path in glob.glob(os.path.join(directory, '*.json'))
+        if path not in skipped
+    ]
+    # Read after the workers: a worker folded meanwhile is listed here.
+    archived = _read(os.path.join(directory, ARCHIVE)) or {}
+    folded = set(archived.get('folded', ()))
+    merged = Registry()
+    for snapshot in snapshots + [archived]:
+        if snapshot and snapshot.get('process') not in folded:
+            merged.merge(snapshot)
+    merged.merge(REGISTRY.snapshot())
+    return merged
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + sorted(extra.items())
+    if not pairs:
+        return ''
+    return '{%s}' % ','.join(
+        '%s="%s"' % (name, str(value).replace('\\', r'\\')
+                     .replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in pairs
+    )
+
+
+def render(registry):
+    """Prometheus text exposition of the registry"""
+    lines = []
+    for name, (kind, description) in METRICS.items():
+        lines += ['# HELP %s %s' % (name, description),
+                  '# TYPE %s %s' % (name, kind)]
+        for (metric, labels), value in sorted(registry.counters.items()):
+            if metric == name:
+                lines.append('%s%s %s' % (name, _labels(labels), value))
+        for (metric, labels), values in sorted(registry.histograms.items()):
+            if metric != name:
+                continue
+            total = 0
+            for bound, count in zip(BUCKETS + ('+Inf',), values):
+                total += count
+                lines.append('%s_bucket%s %s' % (
+                    name, _labels(labels, le=bound), total
+                ))
+            lines.append('%s_sum%s %s' % (name, _labels(labels), values[-2]))
+            lines.append('%s_count%s %s' % (
+                name, _labels(labels), values[-1]
+            ))
+    return '\n'.join(lines) + '\n'
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unresolved'
+
+
+class SQLTimer:
+    """``execute_wrapper`` hook counting and timing statements"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        global _flush_at_exit
+        if not _flush_at_exit:
+            _flush_at_exit = True
+            atexit.register(flush, force=True)
+
+    def __call__(self, request):
+        timer = SQLTimer()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        view = view_name(request)
+        REGISTRY.observe(
+            'yatube_request_duration_seconds',
+            time.perf_counter() - started, view=view
+        )
+        REGISTRY.inc(
+            'yatube_requests_total', view=view, method=request.method,
+            status=response.status_code
+        )
+        REGISTRY.inc('yatube_sql_queries_total', timer.count, view=view)
+        REGISTRY.inc(
+            'yatube_sql_duration_seconds_total', timer.duration, view=view
+        )
+        flush()
+        return response
+
+
+def metrics(request):
+    """Metrics of all workers in the Prometheus text format"""
+    token = settings.METRICS_TOKEN
+    if not token or not hmac.compare_digest(
+            request.META.get('HTTP_AUTHORIZATION', ''), 'Bearer ' + token):
+        raise Http404
+    return HttpResponse(render(collect()), content_type=CONTENT_TYPE)
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            REGISTRY.observe(
+                'yatube_template_render_seconds',
+                time.perf_counter() - started,
+                view=view_name(request), template=self.origin.template_name
+            )
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """Django template backend reporting render times to ``REGISTRY``"""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
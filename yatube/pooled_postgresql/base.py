@@ -0,0 +1,71 @@
+"""PostgreSQL backend that checks connections out of a per-worker pool.
+
+Django closes its connection at the end of every request when
+``CONN_MAX_AGE`` is 0; with this backend "closing" returns the psycopg2
+connection to the pool (see ``pool.py``) and the next request, in any
+thread or greenlet of the worker, reuses it. Pool options are read from
+the ``POOL`` key of the database settings::
+
+    'ENGINE': 'yatube.pooled_postgresql',
+    'CONN_MAX_AGE': 0,
+    'POOL': {'SIZE': 10, 'TIMEOUT': 10, 'CHECK_INTERVAL': 30},
+"""
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+from .pool import PoolExhausted, get_pool
+
+Database = base.Database
+
+
+def ping(connection):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except Database.Error:
+        return False
+    return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict.get('POOL', {}))
+
+    def get_new_connection(self, conn_params):
+        parent = super().get_new_connection
+        try:
+            connection = self.pool.acquire(lambda: parent(conn_params), ping)
+        except PoolExhausted as error:
+            raise Database.OperationalError(str(error)) from error
+        # A pooled connection skipped the parent's setup of the wrapper.
+        options = self.settings_dict['OPTIONS']
+        self.isolation_level = options.get(
+            'isolation_level', connection.isolation_level
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+        with self.wrap_database_errors:
+            self.pool.release(
+                self.connection,
+                reusable=self._reset_connection(),
+                healthy=not self.errors_occurred,
+            )
+
+    def _reset_connection(self):
+        """Roll back whatever the last user left open"""
+        connection = self.connection
+        if connection.closed:
+            return False
+        try:
+            status = connection.get_transaction_status()
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                return False
+            if status != extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+        except Database.Error:
+            return False
+        return True
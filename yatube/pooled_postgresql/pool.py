@@ -0,0 +1,114 @@
+"""A bounded pool of database connections for one worker process.
+
+At most ``SIZE`` connections are checked out at a time: with threaded
+gunicorn workers a request waits for a free connection instead of
+opening one per thread, and with gevent (which patches ``threading``)
+the same limit applies to greenlets. Idle connections are kept last in,
+first out, so the hot ones stay warm and the rest can be closed by the
+server's idle timeout. A connection that sat idle longer than
+``CHECK_INTERVAL`` seconds, or whose last user saw an error, is pinged
+before it is handed out and replaced when the ping fails.
+
+The pool knows nothing about Django or psycopg2: connections only need
+``close()`` and a ``closed`` attribute, the ping is passed in.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+
+class PoolExhausted(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, size=10, timeout=10, check_interval=30,
+                 max_idle=None):
+        self.size = int(size)
+        self.timeout = float(timeout)
+        self.check_interval = float(check_interval)
+        self.max_idle = self.size if max_idle is None else int(max_idle)
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._idle = deque()
+
+    def acquire(self, connect, ping):
+        """Return an idle healthy connection or a new one from ``connect``"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolExhausted(
+                'No free database connection after %s seconds '
+                '(pool size %s)' % (self.timeout, self.size)
+            )
+        try:
+            while True:
+                with self._lock:
+                    if not self._idle:
+                        break
+                    connection, checked = self._idle.pop()
+                if connection.closed:
+                    continue
+                if time.monotonic() - checked < self.check_interval:
+                    return connection
+                if ping(connection):
+                    return connection
+                self._discard(connection)
+            return connect()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, connection, reusable=True, healthy=True):
+        """Give a connection back; ``healthy=False`` forces a ping on reuse"""
+        try:
+            if not reusable or connection.closed:
+                self._discard(connection)
+                return
+            checked = time.monotonic() if healthy else float('-inf')
+            with self._lock:
+                if len(self._idle) < self.max_idle:
+                    self._idle.append((connection, checked))
+                    return
+            self._discard(connection)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """Close all idle connections"""
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+        for connection, _ in idle:
+            self._discard(connection)
+
+    @property
+    def idle_count(self):
+        return len(self._idle)
+
+    @staticmethod
+    def _discard(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, options):
+    """Pool of the current process for a database alias.
+
+    Pools are keyed by process id so a worker forked from a process that
+    already opened connections never shares their sockets.
+    """
+    key = (os.getpid(), alias)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = ConnectionPool(**{
+                    name.lower(): value for name, value in options.items()
+                })
+    return pool
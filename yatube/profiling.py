@@ -0,0 +1,219 @@
+"""Opt-in profiling of sampled and slow requests.
+
+With ``PROFILING_DIR`` set, ``ProfilingMiddleware`` runs a share of
+``PROFILING_SAMPLE_RATE`` requests under cProfile. Every other request
+is watched by a background thread that samples the stack of the request
+thread every ``PROFILING_STACK_INTERVAL`` seconds; the samples are kept
+only if the request takes longer than ``PROFILING_SLOW_SECONDS``. The
+sampler walks the frames of every request in flight, so the interval is
+long enough for the walks to stay cheap next to the requests. The
+SQL statements of a request and their durations are recorded either way.
+
+Kept requests are written to ``PROFILING_DIR`` as JSON (plus a ``.prof``
+file for cProfile runs, readable with ``pstats`` or snakeviz); only the
+newest ``PROFILING_MAX_FILES`` dumps are kept. ``manage.py
+profile_summary`` prints the hottest functions and queries per view.
+
+Stack sampling sees OS threads: under the gevent worker class all
+greenlets share one thread and the stacks of slow requests mix, rely on
+the sampled cProfile runs and the SQL there.
+"""
+import cProfile
+import glob
+import json
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .metrics import view_name
+
+MAX_QUERIES = 1000
+TOP_FUNCTIONS = 100
+
+
+def _function(path, line, name):
+    """``package/module.py:12(name)``"""
+    short = '/'.join(path.replace(os.sep, '/').rsplit('/', 2)[-2:])
+    return '%s:%s(%s)' % (short, line, name)
+
+
+class StackSampler(threading.Thread):
+    """Collects collapsed stacks of the watched threads"""
+
+    def __init__(self, interval):
+        super().__init__(name='stack-sampler', daemon=True)
+        self.interval = interval
+        self.watched = {}
+        self.lock = threading.Lock()
+
+    def watch(self, thread_id):
+        stacks = Counter()
+        with self.lock:
+            self.watched[thread_id] = stacks
+        return stacks
+
+    def unwatch(self, thread_id):
+        with self.lock:
+            self.watched.pop(thread_id, None)
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            # Held while sampling, so nothing is added after ``unwatch``.
+            with self.lock:
+                if not self.watched:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, stacks in self.watched.items():
+                    frame = frames.get(thread_id)
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append(_function(
+                            code.co_filename, code.co_firstlineno,
+                            code.co_name
+                        ))
+                        frame = frame.f_back
+                    if stack:
+                        stacks[';'.join(reversed(stack))] += 1
+
+
+class QueryRecorder:
+    """``execute_wrapper`` hook keeping statements with their durations"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if len(self.queries) < MAX_QUERIES:
+                self.queries.append({
+                    'sql': sql,
+                    'duration': time.perf_counter() - started,
+                })
+
+
+def profile_functions(profile):
+    """Rows of the functions with the most own time in a cProfile run"""
+    stats = pstats.Stats(profile).stats
+    rows = [
+        {'function': _function(path, line, name),
+         'calls': calls, 'own': own, 'total': total}
+        for (path, line, name), (_, calls, own, total, _) in stats.items()
+    ]
+    rows.sort(key=lambda row: row['own'], reverse=True)
+    return rows[:TOP_FUNCTIONS]
+
+
+def stack_functions(stacks, interval):
+    """Rows of the functions seen most often on top of the sampled stacks"""
+    own, total = Counter(), Counter()
+    for stack, count in stacks.items():
+        functions = stack.split(';')
+        own[functions[-1]] += count
+        for function in set(functions):
+            total[function] += count
+    rows = [
+        {'function': function, 'calls': None,
+         'own': own[function] * interval, 'total': samples * interval}
+        for function, samples in total.items()
+    ]
+    rows.sort(key=lambda row: row['own'], reverse=True)
+    return rows[:TOP_FUNCTIONS]
+
+
+def rotate(directory, keep):
+    dumps = sorted(glob.glob(os.path.join(directory, '*.json')))
+    for path in dumps[:max(len(dumps) - keep, 0)]:
+        for name in (path, path[:-len('.json')] + '.prof'):
+            try:
+                os.remove(name)
+            except FileNotFoundError:
+                pass
+
+
+def dump(record, profile=None):
+    """Write a kept request to ``PROFILING_DIR``"""
+    directory = settings.PROFILING_DIR
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, '%d-%d-%s' % (
+        time.time() * 1000, os.getpid(), record['view'].replace(':', '_')
+    ))
+    if profile is not None:
+        profile.dump_stats(base + '.prof')
+    temporary = base + '.tmp'
+    with open(temporary, 'w') as file:
+        json.dump(record, file)
+    os.replace(temporary, base + '.json')
+    rotate(directory, settings.PROFILING_MAX_FILES)
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        if not settings.PROFILING_DIR:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sampler = None
+        self.lock = threading.Lock()
+
+    def get_sampler(self):
+        # Started on the first request, after gunicorn has forked.
+        with self.lock:
+            if self.sampler is None:
+                self.sampler = StackSampler(settings.PROFILING_STACK_INTERVAL)
+                self.sampler.start()
+        return self.sampler
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        profile = None
+        if random.random() < settings.PROFILING_SAMPLE_RATE:
+            profile = cProfile.Profile()
+        else:
+            thread_id = threading.get_ident()
+            stacks = self.get_sampler().watch(thread_id)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(recorder))
+                if profile is not None:
+                    response = profile.runcall(self.get_response, request)
+                else:
+                    response = self.get_response(request)
+        finally:
+            if profile is None:
+                self.sampler.unwatch(thread_id)
+        duration = time.perf_counter() - started
+        if profile is None and duration < settings.PROFILING_SLOW_SECONDS:
+            return response
+        record = {
+            'view': view_name(request),
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration': duration,
+            'time': time.time(),
+            'kind': 'cprofile' if profile is not None else 'stack',
+            'queries': recorder.queries,
+        }
+        if profile is not None:
+            record['functions'] = profile_functions(profile)
+        else:
+            interval = settings.PROFILING_STACK_INTERVAL
+            record['functions'] = stack_functions(stacks, interval)
+            record['stacks'] = dict(stacks)
+        dump(record, profile)
+        return response
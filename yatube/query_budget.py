@@ -0,0 +1,60 @@
+"""Per-view SQL query budgets.
+
+Views declare the most queries a request may run with ``query_budget``.
+Tests enforce the budgets, ``QueryBudgetMiddleware`` logs requests that
+exceed them in production.
+"""
+import logging
+from contextlib import ExitStack
+
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+def query_budget(limit):
+    """Declare the maximum number of queries a request to the view runs"""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+def get_budget(view):
+    """Budget of a resolved view function or class-based view"""
+    budget = getattr(view, 'query_budget', None)
+    if budget is None and hasattr(view, 'view_class'):
+        budget = getattr(view.view_class, 'query_budget', None)
+    return budget
+
+
+class QueryCounter:
+    """``execute_wrapper`` hook counting the statements it sees"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        budget = get_budget(match.func) if match else None
+        if budget is not None and counter.count > budget:
+            logger.warning(
+                'Query budget exceeded: %s ran %d queries, budget is %d',
+                match.view_name, counter.count, budget,
+                extra={'request': request}
+            )
+        return response
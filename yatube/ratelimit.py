@@ -0,0 +1,96 @@
+"""Rate limits for write views, counted in the shared cache.
+
+``RATELIMITS`` maps a scope to ``'<requests>/<s|m|h|d>'``. Requests are
+counted per scope and per user (or client IP for anonymous requests) in
+fixed windows with an atomic ``incr``. The previous window's count is
+weighted by how much of it still overlaps the sliding window, so bursts
+at window boundaries are smoothed much like with a token bucket, but
+every check is just one ``incr`` and one ``get`` without locks.
+
+Over the limit the view is not called and the client gets ``429`` with
+``Retry-After``.
+"""
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.shortcuts import render
+
+KEY = 'ratelimit:%s:%s:%s'
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """``'10/m'`` -> ``(10, 60)``"""
+    count, _, period = rate.partition('/')
+    return int(count), PERIODS[period]
+
+
+def client_id(request):
+    if request.user.is_authenticated:
+        return 'user:%s' % request.user.pk
+    return 'ip:%s' % request.META.get(settings.RATELIMIT_IP_HEADER, '')
+
+
+def _incr(cache, key, timeout):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, timeout):
+            return 1
+        return cache.incr(key)
+
+
+def hit(scope, ident, now=None):
+    """Count a request, return seconds to wait or 0 if it is allowed"""
+    rate = settings.RATELIMITS.get(scope)
+    if rate is None:
+        return 0
+    limit, period = parse_rate(rate)
+    now = time.time() if now is None else now
+    window = int(now // period)
+    cache = caches[settings.RATELIMIT_CACHE]
+    current = _incr(cache, KEY % (scope, ident, window), period * 2)
+    previous = cache.get(KEY % (scope, ident, window - 1), 0)
+    # Multiplied out, so whole seconds compare exactly.
+    offset = now - window * period
+    if previous * (period - offset) + current * period <= limit * period:
+        return 0
+    wait = _wait(limit, previous, current, offset / period)
+    return max(1, math.ceil(wait * period))
+
+
+def _wait(limit, previous, current, elapsed):
+    """Windows until a retry, counted as one more request, is allowed.
+
+    The retry passes once the weight of the previous window has dropped
+    to ``previous * (1 - e) + current + 1 <= limit``; in the next window
+    this window's count becomes the previous one.
+    """
+    if previous and current < limit:
+        return 1 - (limit - current - 1) / previous - elapsed
+    return 1 - elapsed + max(0, 1 - (limit - 1) / current)
+
+
+def ratelimit(scope, methods=('POST',)):
+    """Limit requests to the view with the ``RATELIMITS[scope]`` rate.
+
+    Only requests with one of ``methods`` are counted, ``None`` counts
+    every request.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if methods is None or request.method in methods:
+                wait = hit(scope, client_id(request))
+                if wait:
+                    response = render(
+                        request, 'misc/429.html', {'wait': wait}, status=429
+                    )
+                    response['Retry-After'] = str(wait)
+                    return response
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,102 @@
+"""Reads from replicas, writes and recent writers on the primary.
+
+``ReplicaRouter`` sends reads made while ``ReplicaMiddleware`` handles a
+request to one of ``DATABASE_REPLICAS`` and everything else to
+``default``. Reads outside requests (management commands, the rendition
+workers) and inside transactions stay on the primary.
+
+Replicas lag behind the primary, so a client that has just written
+would not find its post or comment on the page it is redirected to. The
+first write of a request pins the rest of it to the primary and the
+response sets a cookie that keeps the client's reads there for
+``REPLICA_PIN_SECONDS``. Requests with unsafe methods are pinned from
+the start; other clients keep reading the replicas. Fragments and ETags
+are keyed by version stamps that writes replace right away, so while a
+stamp is younger than ``REPLICA_PIN_SECONDS`` (see ``may_lag``) requests
+reading the replicas neither store fragments nor send validators: rows
+a replica has not caught up with would be kept under the new stamp.
+Apps in ``REPLICA_EXCLUDED_APPS`` (sessions and users) are always read
+from the primary: a stale session could bring back a user
+who has just logged out or changed the password.
+"""
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+COOKIE = 'primary_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+_state = threading.local()
+
+
+def in_request():
+    return getattr(_state, 'in_request', False)
+
+
+def pin():
+    """Send the remaining reads of the request to the primary"""
+    if in_request():
+        _state.pinned = True
+        _state.wrote = True
+
+
+def reads_replicas():
+    """Whether reads made now go to the replicas"""
+    return bool(
+        settings.DATABASE_REPLICAS and in_request() and not _state.pinned
+        and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+    )
+
+
+def may_lag(stamp):
+    """Whether the request reads replicas that may predate ``stamp``"""
+    return (
+        reads_replicas()
+        and time.time() - stamp < settings.REPLICA_PIN_SECONDS
+    )
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (not reads_replicas()
+                or model._meta.app_label in settings.REPLICA_EXCLUDED_APPS):
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        pin()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            pinned_until = float(request.COOKIES.get(COOKIE, 0))
+        except ValueError:
+            pinned_until = 0
+        _state.in_request = True
+        _state.wrote = False
+        _state.pinned = (
+            request.method not in SAFE_METHODS or pinned_until > time.time()
+        )
+        try:
+            response = self.get_response(request)
+            if _state.wrote:
+                window = settings.REPLICA_PIN_SECONDS
+                response.set_cookie(
+                    COOKIE, '%.3f' % (time.time() + window),
+                    max_age=window, httponly=True, samesite='Lax'
+                )
+        finally:
+            _state.in_request = False
+        return response
@@ -22,12 +22,17 @@ INSTALLED_APPS = [
     'posts',
     'users',
     'about',
+    'api',
     'sorl.thumbnail',
     'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'yatube.metrics.MetricsMiddleware',
+    'yatube.profiling.ProfilingMiddleware',
+    'yatube.query_budget.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'yatube.replicas.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -42,7 +47,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'yatube.metrics.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -66,9 +71,34 @@ DATABASES = {
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
         'PORT': os.getenv('DB_PORT'),
+        # Seconds a connection outlives its request. Keep 0 with the
+        # yatube.pooled_postgresql engine: it returns connections to the
+        # worker's pool instead of closing them.
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 0)),
+        'POOL': {
+            'SIZE': int(os.getenv('DB_POOL_SIZE', 10)),
+            'TIMEOUT': int(os.getenv('DB_POOL_TIMEOUT', 10)),
+            'CHECK_INTERVAL': int(os.getenv('DB_POOL_CHECK_INTERVAL', 30)),
+        },
     }
 }
 
+# Read replicas, see yatube.replicas. DB_REPLICAS lists their hosts
+# separated by commas (files for SQLite), the other settings are those
+# of the primary.
+DATABASE_REPLICAS = []
+_REPLICA_KEY = 'NAME' if 'sqlite' in os.getenv('DB_ENGINE', '') else 'HOST'
+for _number, _location in enumerate(
+        filter(None, os.getenv('DB_REPLICAS', '').split(',')), start=1):
+    DATABASE_REPLICAS.append('replica%d' % _number)
+    DATABASES[DATABASE_REPLICAS[-1]] = dict(
+        DATABASES['default'], **{_REPLICA_KEY: _location.strip()}
+    )
+DATABASE_ROUTERS = ['yatube.replicas.ReplicaRouter']
+# Seconds the reads of a client stay on the primary after it has written.
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 5))
+REPLICA_EXCLUDED_APPS = ['auth', 'sessions']
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -95,7 +125,9 @@ USE_L10N = True
 USE_TZ = True
 
 STATIC_URL = '/static/'
-STATIC_ROOT = os.path.join(BASE_DIR, 'static/')
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles/')
+STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+STATICFILES_STORAGE = 'yatube.storage.CompressedManifestStaticFilesStorage'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
@@ -108,12 +140,112 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'yatube.cache.TwoTierCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'LOCAL_MAX_ENTRIES': int(os.getenv('CACHE_LOCAL_MAX_ENTRIES', 1000)),
+            'LOCAL_TIMEOUT': int(os.getenv('CACHE_LOCAL_TIMEOUT', 5)),
+        },
+    },
+    'shared': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default=''),
+    },
+}
+
+# Requests per user (or IP for anonymous users) per second, minute, hour
+# or day, see yatube.ratelimit. Follows and unfollows share one limit.
+RATELIMITS = {
+    'new_post': '10/m',
+    'add_comment': '30/m',
+    'follow': '60/m',
+    'group_create': '5/h',
+    'signup': '5/h',
 }
+RATELIMIT_CACHE = 'shared'
+# Behind nginx the client address is in X-Real-IP.
+RATELIMIT_IP_HEADER = os.getenv('RATELIMIT_IP_HEADER', 'REMOTE_ADDR')
+
+# Ids of the authors a user follows, see posts.following. Kept in the
+# shared cache under the user's follows version, which every follow and
+# unfollow replaces once committed.
+FOLLOWING_CACHE = 'shared'
+FOLLOWING_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Prometheus metrics, see yatube.metrics. With several gunicorn workers
+# METRICS_DIR must be set so /metrics can sum the numbers of all of them.
+METRICS_DIR = os.getenv('METRICS_DIR')
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+METRICS_FLUSH_INTERVAL = 1
+
+# Profiling of sampled and slow requests, see yatube.profiling. Off
+# unless PROFILING_DIR is set.
+PROFILING_DIR = os.getenv('PROFILING_DIR')
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', 0.01))
+PROFILING_SLOW_SECONDS = float(os.getenv('PROFILING_SLOW_SECONDS', 1))
+# Every request thread is sampled while it runs, since a slow one is only
+# known at the end. 50 ms still gives a slow request dozens of samples.
+PROFILING_STACK_INTERVAL = float(
+    os.getenv('PROFILING_STACK_INTERVAL', 0.05)
+)
+PROFILING_MAX_FILES = int(os.getenv('PROFILING_MAX_FILES', 500))
 
 PAGINATE_BY = 10
 
+COMMENTS_PAGINATE_BY = 20
+
+GROUPS_PAGINATE_BY = 50
+
+# Feed fragments are invalidated by version stamps on every write,
+# the timeout only bounds how long unused pages stay in the cache.
+FEED_CACHE_TIMEOUT = 600
+
+# Cards are keyed by post version, so they never go stale.
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
+
+# Image sizes used by the templates, generated in the background after
+# upload. Options are passed to sorl-thumbnail's get_thumbnail.
+# Uploads are re-encoded to POST_IMAGE_FORMAT and scaled down to
+# POST_IMAGE_MAX_SIZE pixels on the longest side, see posts.images.
+POST_IMAGE_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+POST_IMAGE_MAX_DIMENSION = 10000
+POST_IMAGE_MAX_SIZE = 2048
+POST_IMAGE_FORMAT = 'WEBP'
+POST_IMAGE_QUALITY = 80
+
+# Card renditions offered to browsers through srcset, 'card' is the
+# fallback src.
+_CARD_RENDITION = {
+    'crop': 'center', 'upscale': True, 'format': POST_IMAGE_FORMAT,
+    'quality': POST_IMAGE_QUALITY,
+}
+POST_IMAGE_RENDITIONS = {
+    'card_small': ('360x210', _CARD_RENDITION),
+    'card': ('600x350', _CARD_RENDITION),
+    'card_large': ('1200x700', _CARD_RENDITION),
+}
+RENDITIONS_ASYNC = True
+RENDITION_WORKERS = 2
+
+# Authors with more followers are not fanned out into timelines, the
+# feeds of their followers add the authors' posts to the timeline ones.
+# They are fanned out again, off the request path, only after dropping
+# to TIMELINE_DEMOTE_LIMIT followers, so that a follow and an unfollow
+# at the limit do not switch the author back and forth.
+TIMELINE_FANOUT_LIMIT = 1000
+TIMELINE_DEMOTE_LIMIT = 900
+TIMELINE_BACKFILL_ASYNC = True
+
+# Popular feed, see posts.trending. Posts older than the window drop out,
+# comments lose half of their weight every TRENDING_HALF_LIFE_HOURS and
+# the score is divided by the post's age in hours to the TRENDING_GRAVITY.
+TRENDING_WINDOW_DAYS = 3
+TRENDING_HALF_LIFE_HOURS = 6
+TRENDING_GRAVITY = 1.5
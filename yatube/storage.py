@@ -0,0 +1,68 @@
+"""Static files storage with content hashed names and precompressed copies.
+
+``collectstatic`` writes ``name.<hash>.ext`` next to every file, as
+``ManifestStaticFilesStorage`` does, and then a ``.gz`` (and ``.br`` when
+the ``brotli`` package is installed) sibling of every hashed text asset,
+so nginx serves them with ``gzip_static`` and never compresses on the fly.
+Hashed names are safe to cache forever, see ``nginx.conf``.
+
+Files that are not in the manifest (tests and development, where
+``collectstatic`` has not been run) are served under their plain names.
+"""
+import gzip
+import io
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSED_EXTENSIONS = (
+    '.css', '.js', '.map', '.svg', '.json', '.txt', '.html', '.xml',
+    '.ico', '.ttf', '.otf', '.eot',
+)
+# Compressed copies that do not save at least 5% are not written.
+MIN_RATIO = 0.95
+
+
+def gzip_compress(content):
+    # A fixed mtime keeps the output identical between deploys.
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb', mtime=0) as target:
+        target.write(content)
+    return buffer.getvalue()
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for hashed_name in set(self.hashed_files.values()):
+            if hashed_name.endswith(COMPRESSED_EXTENSIONS):
+                yield from self.compress(hashed_name)
+
+    def compress(self, name):
+        with self.open(name) as source:
+            content = source.read()
+        compressors = [('.gz', gzip_compress)]
+        if brotli is not None:
+            compressors.append(('.br', brotli.compress))
+        for suffix, compress in compressors:
+            compressed = compress(content)
+            if len(compressed) >= len(content) * MIN_RATIO:
+                continue
+            path = self.path(name + suffix)
+            with open(path, 'wb') as target:
+                target.write(compressed)
+            yield name, name + suffix, True
@@ -0,0 +1,67 @@
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import TestCase
+
+from ..cache import TwoTierCache
+
+
+class TwoTierCacheTests(TestCase):
+    def setUp(self):
+        self.shared = caches['shared']
+        self.shared.clear()
+        self.cache = TwoTierCache('', {
+            'OPTIONS': {
+                'SHARED': 'shared',
+                'LOCAL_MAX_ENTRIES': 2,
+                'LOCAL_TIMEOUT': 5,
+            },
+        })
+
+    def test_reads_are_served_from_local_tier(self):
+        """Повторное чтение не обращается к общему кэшу"""
+        self.cache.set('key', 'value')
+        self.shared.delete('key')
+        self.assertEqual(self.cache.get('key'), 'value')
+
+    def test_local_tier_is_bounded(self):
+        """Локальный кэш вытесняет давно не использованные ключи"""
+        self.cache.set('first', 1)
+        self.cache.set('second', 2)
+        self.cache.get('first')
+        self.cache.set('third', 3)
+        self.shared.clear()
+        self.assertEqual(self.cache.get('first'), 1)
+        self.assertIsNone(self.cache.get('second'))
+        self.assertEqual(self.cache.get('third'), 3)
+
+    def test_local_entries_expire(self):
+        """Локальная копия живёт не дольше LOCAL_TIMEOUT"""
+        self.cache.set('key', 'old')
+        self.shared.set('key', 'new')
+        with mock.patch('yatube.cache.time.monotonic') as monotonic:
+            monotonic.return_value = 10 ** 9
+            self.assertEqual(self.cache.get('key'), 'new')
+
+    def test_version_stamps_bypass_local_tier(self):
+        """Версии всегда читаются из общего кэша"""
+        other_worker = TwoTierCache('', {'OPTIONS': {'SHARED': 'shared'}})
+        self.cache.set('version:feeds', 1)
+        other_worker.set('version:feeds', 2)
+        self.assertEqual(self.cache.get('version:feeds'), 2)
+
+    def test_get_many_merges_tiers(self):
+        """get_many собирает значения из обоих уровней"""
+        self.cache.set('local', 1)
+        self.shared.set('remote', 2)
+        self.assertEqual(
+            self.cache.get_many(['local', 'remote', 'missing']),
+            {'local': 1, 'remote': 2}
+        )
+
+    def test_delete_removes_both_tiers(self):
+        """Удаление очищает оба уровня"""
+        self.cache.set('key', 'value')
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.assertIsNone(self.shared.get('key'))
@@ -0,0 +1,56 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..pooled_postgresql.pool import ConnectionPool, PoolExhausted
+
+
+class FakeConnection:
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.pool = ConnectionPool(size=2, timeout=0.01, check_interval=30)
+        self.ping = mock.Mock(return_value=True)
+
+    def test_released_connection_is_reused(self):
+        """Возвращённое в пул соединение выдаётся повторно без проверки"""
+        connection = self.pool.acquire(FakeConnection, self.ping)
+        self.pool.release(connection)
+
+        self.assertIs(self.pool.acquire(FakeConnection, self.ping), connection)
+        self.ping.assert_not_called()
+
+    def test_pool_is_bounded(self):
+        """Больше SIZE соединений одновременно выдать нельзя"""
+        first = self.pool.acquire(FakeConnection, self.ping)
+        self.pool.acquire(FakeConnection, self.ping)
+        with self.assertRaises(PoolExhausted):
+            self.pool.acquire(FakeConnection, self.ping)
+
+        self.pool.release(first)
+        self.assertIs(self.pool.acquire(FakeConnection, self.ping), first)
+
+    def test_broken_connection_is_replaced(self):
+        """Соединение после ошибки проверяется и заменяется, если мертво"""
+        broken = self.pool.acquire(FakeConnection, self.ping)
+        self.pool.release(broken, healthy=False)
+        self.ping.return_value = False
+
+        connection = self.pool.acquire(FakeConnection, self.ping)
+
+        self.ping.assert_called_once_with(broken)
+        self.assertTrue(broken.closed)
+        self.assertIsNot(connection, broken)
+
+    def test_unreusable_connection_is_closed(self):
+        """Соединение с незавершённой транзакцией в пул не возвращается"""
+        connection = self.pool.acquire(FakeConnection, self.ping)
+        self.pool.release(connection, reusable=False)
+
+        self.assertTrue(connection.closed)
+        self.assertEqual(self.pool.idle_count, 0)
@@ -0,0 +1,106 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post, User
+
+from ..metrics import REGISTRY, Registry, archive, collect, render
+
+METRICS_DIR = tempfile.mkdtemp()
+
+
+@override_settings(METRICS_DIR=METRICS_DIR, METRICS_TOKEN='secret')
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='author')
+        Post.objects.create(text='Пост', author=author)
+        cls.metrics_client = Client(HTTP_AUTHORIZATION='Bearer secret')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(METRICS_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        for name in os.listdir(METRICS_DIR):
+            os.remove(os.path.join(METRICS_DIR, name))
+
+    def write_worker(self, pid, **labels):
+        registry = Registry()
+        registry.inc('yatube_requests_total', 5, **labels)
+        registry.observe('yatube_request_duration_seconds', 0.2, view='x')
+        path = os.path.join(METRICS_DIR, '%s.json' % pid)
+        with open(path, 'w') as file:
+            json.dump(dict(registry.snapshot(), process='%s-1' % pid), file)
+
+    def test_requests_are_measured(self):
+        """Запросы, SQL, шаблоны и кэш попадают в метрики"""
+        self.metrics_client.get(reverse('index'))
+        text = self.metrics_client.get(reverse('metrics')).content.decode()
+        self.assertIn(
+            'yatube_requests_total{method="GET",status="200",view="index"}',
+            text
+        )
+        self.assertIn(
+            'yatube_request_duration_seconds_bucket{view="index",le="+Inf"}',
+            text
+        )
+        self.assertIn('yatube_sql_queries_total{view="index"}', text)
+        self.assertIn(
+            'yatube_template_render_seconds_count'
+            '{template="index.html",view="index"}',
+            text
+        )
+        self.assertIn('yatube_cache_requests_total{result="hit"', text)
+
+    def test_workers_are_summed(self):
+        """Метрики воркеров, в том числе завершившихся, складываются"""
+        self.write_worker(1, view='other')
+        self.write_worker(2, view='other')
+        archive(METRICS_DIR, 2)
+        self.assertFalse(os.path.exists(os.path.join(METRICS_DIR, '2.json')))
+
+        text = render(collect())
+        self.assertIn('yatube_requests_total{view="other"} 10', text)
+        self.assertIn(
+            'yatube_request_duration_seconds_bucket{view="x",le="0.25"} 2',
+            text
+        )
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="x"} 2', text
+        )
+
+    def test_worker_being_archived_is_counted_once(self):
+        """Файл воркера, уже попавший в архив, не учитывается дважды"""
+        self.write_worker(3, view='folded')
+        archive(METRICS_DIR, 3)
+        # A scrape between writing the archive and removing the file.
+        self.write_worker(3, view='folded')
+        self.assertIn(
+            'yatube_requests_total{view="folded"} 5', render(collect())
+        )
+
+    def test_endpoint_requires_token(self):
+        """Без токена /metrics отвечает 404"""
+        for headers in ({}, {'HTTP_AUTHORIZATION': 'Bearer wrong'}):
+            with self.subTest(headers=headers):
+                response = Client(**headers).get(reverse('metrics'))
+                self.assertEqual(response.status_code, 404)
+
+        with override_settings(METRICS_TOKEN=None):
+            response = self.metrics_client.get(reverse('metrics'))
+            self.assertEqual(response.status_code, 404)
+
+    def test_own_numbers_are_live(self):
+        """Метрики своего процесса видны до записи на диск"""
+        REGISTRY.observe('yatube_rendition_seconds', 0.3, rendition='probe')
+        self.assertIn(
+            'yatube_rendition_seconds_count{rendition="probe"} 1',
+            render(collect())
+        )
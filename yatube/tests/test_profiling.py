@@ -0,0 +1,98 @@
+import glob
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.management.commands.profile_summary import normalize
+from posts.models import Post, User
+
+PROFILING_DIR = tempfile.mkdtemp()
+
+
+@override_settings(
+    PROFILING_DIR=PROFILING_DIR, PROFILING_SAMPLE_RATE=0,
+    PROFILING_SLOW_SECONDS=60
+)
+class ProfilingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='author')
+        Post.objects.create(text='Пост', author=author)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(PROFILING_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        for path in glob.glob(os.path.join(PROFILING_DIR, '*')):
+            os.remove(path)
+
+    def dumps(self):
+        records = []
+        for path in sorted(glob.glob(os.path.join(PROFILING_DIR, '*.json'))):
+            with open(path) as file:
+                records.append(json.load(file))
+        return records
+
+    def test_fast_requests_are_not_dumped(self):
+        """Быстрые запросы вне выборки не сохраняются"""
+        Client().get(reverse('index'))
+        self.assertEqual(self.dumps(), [])
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_sampled_requests_are_profiled(self):
+        """Запросы из выборки сохраняются с cProfile и SQL"""
+        Client().get(reverse('index'))
+        record, = self.dumps()
+        self.assertEqual(
+            (record['view'], record['kind']), ('index', 'cprofile')
+        )
+        self.assertTrue(record['functions'])
+        self.assertIn('posts_post', record['queries'][0]['sql'])
+        self.assertEqual(
+            len(glob.glob(os.path.join(PROFILING_DIR, '*.prof'))), 1
+        )
+
+    @override_settings(PROFILING_SLOW_SECONDS=0, PROFILING_MAX_FILES=2)
+    def test_slow_requests_are_sampled_and_rotated(self):
+        """Медленные запросы сохраняются со стеками, старые удаляются"""
+        client = Client()
+        for _ in range(3):
+            client.get(reverse('index'))
+        records = self.dumps()
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records[0]['kind'], 'stack')
+        self.assertIn('stacks', records[0])
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_summary_command(self):
+        """profile_summary выводит функции и запросы по страницам"""
+        Client().get(reverse('index'))
+        Client().get(reverse('post', args=['author', 0]))
+        output = StringIO()
+        call_command('profile_summary', stdout=output)
+        text = output.getvalue()
+        self.assertIn('index: 1 requests (1 cprofile)', text)
+        self.assertIn('post: 1 requests', text)
+        self.assertIn('SELECT "posts_post"."id"', text)
+        self.assertEqual(
+            normalize("SELECT * FROM t WHERE id IN (1, 2) AND s = 'it''s'"),
+            'SELECT * FROM t WHERE id IN (...) AND s = ?'
+        )
+
+    def test_summary_skips_rotated_files(self):
+        """profile_summary пропускает файлы, удалённые ротацией"""
+        missing = os.path.join(PROFILING_DIR, 'rotated.json')
+        with mock.patch('glob.glob', return_value=[missing]):
+            output = StringIO()
+            call_command('profile_summary', stdout=output)
+        self.assertIn('No profiles found', output.getvalue())
@@ -0,0 +1,76 @@
+from http import HTTPStatus
+
+from django.core.cache import caches
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post, User
+
+from ..ratelimit import hit
+
+
+@override_settings(RATELIMITS={
+    'test': '10/m', 'new_post': '2/m', 'signup': '1/h',
+})
+class RateLimitTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='spammer')
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+
+    def setUp(self):
+        caches['shared'].clear()
+
+    def test_previous_window_is_weighted(self):
+        """Запросы прошлого окна учитываются пропорционально перекрытию"""
+        for second in range(10):
+            self.assertEqual(hit('test', 'client', now=60 + second), 0)
+        # Через 6 секунд окна от прошлых 10 запросов осталось 9.
+        self.assertEqual(hit('test', 'client', now=126), 0)
+        self.assertGreater(hit('test', 'client', now=127), 0)
+        self.assertEqual(hit('test', 'client', now=170), 0)
+
+    def test_retry_after_is_enough(self):
+        """Повтор после Retry-After проходит, даже если окно сменилось"""
+        for second in range(11):
+            wait = hit('test', 'client', now=60 + second)
+        self.assertGreater(wait, 0)
+        self.assertEqual(hit('test', 'client', now=70 + wait), 0)
+
+        for second in range(10):
+            hit('test', 'other', now=60 + second)
+        hit('test', 'other', now=126)
+        wait = hit('test', 'other', now=127)
+        self.assertGreater(wait, 0)
+        self.assertEqual(hit('test', 'other', now=127 + wait), 0)
+
+    def test_unknown_scope_is_not_limited(self):
+        """Области без настроенного лимита не ограничиваются"""
+        for _ in range(100):
+            self.assertEqual(hit('other', 'client'), 0)
+
+    def test_view_answers_too_many_requests(self):
+        """Сверх лимита запись не создаётся, ответ 429 с Retry-After"""
+        for i in range(3):
+            response = self.authorized_client.post(
+                reverse('new_post'), {'text': f'Спам {i}'}
+            )
+        self.assertEqual(response.status_code, HTTPStatus.TOO_MANY_REQUESTS)
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertEqual(Post.objects.filter(author=self.user).count(), 2)
+
+        response = self.authorized_client.get(reverse('new_post'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_anonymous_clients_are_limited_by_ip(self):
+        """Анонимные запросы считаются по IP-адресу"""
+        url = reverse('signup')
+        first = Client(REMOTE_ADDR='10.0.0.1')
+        first.post(url, {})
+        response = first.post(url, {})
+        self.assertEqual(response.status_code, HTTPStatus.TOO_MANY_REQUESTS)
+
+        response = Client(REMOTE_ADDR='10.0.0.2').post(url, {})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
@@ -0,0 +1,147 @@
+import time
+from unittest import skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.http import HttpResponse
+from django.test import (
+    Client, RequestFactory, SimpleTestCase, TransactionTestCase,
+    override_settings
+)
+from django.urls import reverse
+
+from posts.cache import VERSION_KEY
+from posts.models import Post, User
+
+from ..replicas import (
+    COOKIE, ReplicaMiddleware, ReplicaRouter, may_lag
+)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def handle(self, request, write=False):
+        """Пропускает запрос через middleware, возвращает базы чтений"""
+        used = []
+
+        def view(request):
+            used.append(self.router.db_for_read(Post))
+            if write:
+                self.router.db_for_write(Post)
+            used.append(self.router.db_for_read(Post))
+            used.append(self.router.db_for_read(User))
+            return HttpResponse()
+
+        response = ReplicaMiddleware(view)(request)
+        return used, response
+
+    def test_reads_go_to_replicas_in_requests_only(self):
+        """Чтения в запросе идут на реплику, вне запроса — на основную"""
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+        used, response = self.handle(self.factory.get('/'))
+        self.assertEqual(used, ['replica1', 'replica1', 'default'])
+        self.assertNotIn(COOKIE, response.cookies)
+
+    def test_write_pins_client_to_primary(self):
+        """После записи чтения клиента идут на основную базу"""
+        used, response = self.handle(self.factory.get('/'), write=True)
+        self.assertEqual(used, ['replica1', 'default', 'default'])
+        cookie = response.cookies[COOKIE]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_PIN_SECONDS)
+
+        request = self.factory.get('/')
+        request.COOKIES[COOKIE] = cookie.value
+        used, _ = self.handle(request)
+        self.assertEqual(used[0], 'default')
+
+        request.COOKIES[COOKIE] = str(time.time() - 1)
+        used, _ = self.handle(request)
+        self.assertEqual(used[0], 'replica1')
+
+    def test_fresh_version_stamp_keeps_readers_on_replicas(self):
+        """Свежая версия кэша не переводит чтения на основную базу"""
+        for age, lags in ((1, True), (60, False)):
+            with self.subTest(age=age):
+                def view(request):
+                    lagging = may_lag(time.time() - age)
+                    return HttpResponse(
+                        '%s %s' % (self.router.db_for_read(Post), lagging)
+                    )
+
+                response = ReplicaMiddleware(view)(self.factory.get('/'))
+                self.assertEqual(
+                    response.content.decode(), 'replica1 %s' % lags
+                )
+                self.assertNotIn(COOKIE, response.cookies)
+
+    def test_pinned_requests_do_not_lag(self):
+        """Закреплённый за основной базой запрос не ждёт реплику"""
+        def view(request):
+            return HttpResponse(str(may_lag(time.time())))
+
+        response = ReplicaMiddleware(view)(self.factory.post('/'))
+        self.assertEqual(response.content.decode(), 'False')
+
+    def test_unsafe_methods_read_primary(self):
+        """Запросы, меняющие данные, читают с основной базы"""
+        used, _ = self.handle(self.factory.post('/'))
+        self.assertEqual(used[0], 'default')
+
+
+@skipUnless(settings.DATABASE_REPLICAS, 'DB_REPLICAS is not set')
+class ReplicaReadYourWritesTests(TransactionTestCase):
+    """Реплика в тестах — отдельная пустая база без репликации.
+
+    Запускается с DB_REPLICAS, например для SQLite:
+    DB_REPLICAS=/tmp/replica.sqlite3 python manage.py test
+    """
+    databases = {'default', *settings.DATABASE_REPLICAS}
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.post = Post.objects.create(text='Пост', author=self.author)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def settle(self):
+        """Версии кэша старше окна закрепления: реплика их догнала"""
+        for name in ('feeds', 'follows:%s' % self.author.pk):
+            cache.set(VERSION_KEY % name, time.time() - 60, None)
+
+    def test_writer_reads_own_writes(self):
+        """Автор видит свою запись сразу, остальные читают реплику"""
+        self.settle()
+        response = Client().get(reverse('index'))
+        self.assertEqual(len(response.context['page']), 0)
+
+        self.author_client.post(
+            reverse('add_comment', args=['author', self.post.id]),
+            {'text': 'Комментарий'}
+        )
+        response = self.author_client.get(reverse('index'))
+        self.assertEqual(list(response.context['page']), [self.post])
+
+    def test_fresh_stamps_are_not_cached_from_replicas(self):
+        """Пока реплика догоняет запись, её данные не кэшируются"""
+        self.settle()
+        self.author_client.post(reverse('group_create'), {
+            'title': 'Новая группа', 'slug': 'new-group', 'description': '-'
+        })
+        response = Client().get(reverse('groups'))
+        self.assertNotContains(response, 'Новая группа')
+        self.assertFalse(response.has_header('ETag'))
+        key = make_template_fragment_key('group_list', [
+            response.context['feed_version'], response.context['today'],
+            response.context['page'].key
+        ])
+        self.assertIsNone(cache.get(key))
+
+        response = self.author_client.get(reverse('groups'))
+        self.assertContains(response, 'Новая группа')
+        self.assertTrue(response.has_header('ETag'))
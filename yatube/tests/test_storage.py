@@ -0,0 +1,52 @@
+import gzip
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+SOURCE_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+STATIC_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+CSS = b'body { color: #333; }\n' * 100
+
+
+@override_settings(
+    STATIC_ROOT=STATIC_ROOT,
+    STATICFILES_DIRS=[SOURCE_DIR],
+    STATICFILES_FINDERS=[
+        'django.contrib.staticfiles.finders.FileSystemFinder',
+    ],
+)
+class CompressedManifestStorageTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with open(os.path.join(SOURCE_DIR, 'site.css'), 'wb') as css:
+            css.write(CSS)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(SOURCE_DIR, ignore_errors=True)
+        shutil.rmtree(STATIC_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_collectstatic_writes_hashed_compressed_files(self):
+        """collectstatic пишет файлы с хешем в имени и их gzip-копии"""
+        call_command('collectstatic', interactive=False, stdout=StringIO())
+        url = staticfiles_storage.url('site.css')
+        hashed = url[len(settings.STATIC_URL):]
+
+        self.assertRegex(hashed, r'^site\.[0-9a-f]{12}\.css$')
+        with open(os.path.join(STATIC_ROOT, hashed + '.gz'), 'rb') as file:
+            self.assertEqual(gzip.decompress(file.read()), CSS)
+
+    def test_missing_file_keeps_plain_name(self):
+        """Файл не из манифеста отдаётся под исходным именем"""
+        self.assertEqual(
+            staticfiles_storage.url('missing.js'),
+            settings.STATIC_URL + 'missing.js'
+        )